@@ -0,0 +1,237 @@
+import argparse, sys, os, glob, json, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from sheet_cache import read_excel_cached
+from sheet_reader import READERS, TEXT_EXTENSIONS
+from table_output import BULK_FORMATS, OUTPUT_MODES
+from timecards_extractor import (ExcelTableExtractor, TIMECARD_START_MARKER, extract_timecards, find_rows_containing,
+                                 make_timecard_writer)
+from payroll_extractor import PayrollDataExtractor, summarize_payroll, write_payrolls
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xlsm") + TEXT_EXTENSIONS
+KINDS = ("auto", "timecards", "payroll")
+
+
+def read_manifest(manifest_path):
+    """(path, sheet) entries of a manifest file: one `path[,sheet]` per line, '#' starts a comment.
+
+    Relative paths are taken from the manifest's directory. A missing sheet means every sheet.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    entries = []
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            path, _, sheet = line.partition(',')
+            entries.append((os.path.join(base, path.strip()), sheet.strip() or None))
+    return entries
+
+
+def collect_inputs(inputs, manifest=None, sheet_name=None):
+    """Expand directories, glob patterns and workbook paths into (path, sheet) entries, without duplicates."""
+    entries = read_manifest(manifest) if manifest else []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths = sorted(os.path.join(item, name) for name in os.listdir(item)
+                           if name.lower().endswith(WORKBOOK_EXTENSIONS) and not name.startswith('~$'))
+        elif glob.has_magic(item):
+            paths = sorted(glob.glob(item, recursive=True))
+        else:
+            paths = [item]
+        entries.extend((path, sheet_name) for path in paths)
+
+    seen = set()
+    unique = []
+    for path, sheet in entries:
+        key = (os.path.abspath(path), sheet)
+        if key not in seen:
+            seen.add(key)
+            unique.append((path, sheet))
+    return unique
+
+
+def output_names(entries):
+    """Output directory name of each entry: the workbook name, numbered when two workbooks share it."""
+    names, used = [], {}
+    for path, sheet in entries:
+        name = os.path.splitext(os.path.basename(path))[0]
+        used[name] = used.get(name, 0) + 1
+        names.append(name if used[name] == 1 else f"{name}_{used[name]}")
+    return names
+
+
+def detect_sheet_kind(df):
+    """'timecards', 'payroll' or None when the sheet looks like neither report."""
+    if df.empty:
+        return None
+    if find_rows_containing(df, TIMECARD_START_MARKER).any():
+        return "timecards"
+    if df[df.columns[0]].astype(str).str.contains('Associate ID', regex=False).any():
+        return "payroll"
+    return None
+
+
+def _safe_name(name):
+    return str(name).replace('/', '-').replace(os.sep, '-')
+
+
+def extract_sheet(file_path, sheet_name, df, kind, output_path, output_mode="per-file", bulk_format="csv"):
+    """Extract one loaded sheet into output_path. Returns (blocks, skipped)."""
+    if kind == "payroll":
+        os.makedirs(os.path.join(output_path, "payrolls") if output_mode == "per-file" else output_path, exist_ok=True)
+        extractor = PayrollDataExtractor(file_path, sheet_name, df=df)
+        extractor.clean_dataframe()
+        return write_payrolls(summarize_payroll(extractor.df), output_path, output_mode, bulk_format), 0
+
+    if output_mode == "per-file":
+        for folder in ("headers", "details"):
+            os.makedirs(os.path.join(output_path, folder), exist_ok=True)
+    else:
+        os.makedirs(output_path, exist_ok=True)
+    writer = make_timecard_writer(output_path, output_mode, bulk_format)
+    extractor = ExcelTableExtractor(file_path, sheet_name, df=df)
+    with writer:
+        return extract_timecards(extractor, writer)
+
+
+def process_workbook(task):
+    """Extract every requested sheet of one workbook. Runs in a worker process, never raises.
+
+    The workbook is read once for all its sheets when no sheet is given.
+    """
+    file_path, sheet_name, output_path, options = task
+    result = {"path": file_path, "sheet": sheet_name, "output": output_path, "status": "ok", "error": None,
+              "size": None, "sheets": [], "blocks": 0, "skipped": 0,
+              "load_seconds": 0.0, "process_seconds": 0.0, "seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        result["size"] = os.path.getsize(file_path)
+        sheets = read_excel_cached(file_path, sheet_name, use_cache=options["use_cache"], reader=options["reader"])
+        if sheet_name is not None:
+            sheets = {sheet_name: sheets}
+        result["load_seconds"] = time.perf_counter() - started
+
+        for name, df in sheets.items():
+            sheet_started = time.perf_counter()
+            sheet = {"name": name, "kind": options["kind"], "status": "ok", "error": None, "blocks": 0, "skipped": 0}
+            try:
+                if sheet["kind"] == "auto":
+                    sheet["kind"] = detect_sheet_kind(df)
+                if sheet["kind"] is None:
+                    sheet["status"] = "skipped"
+                    sheet["error"] = "no timecard or payroll blocks found"
+                else:
+                    sheet_path = output_path if len(sheets) == 1 else os.path.join(output_path, _safe_name(name))
+                    sheet["blocks"], sheet["skipped"] = extract_sheet(file_path, name, df, sheet["kind"], sheet_path,
+                                                                      options["output_mode"], options["bulk_format"])
+            except Exception as e:
+                sheet["status"] = "error"
+                sheet["error"] = f"{type(e).__name__}: {e}"
+            sheet["seconds"] = time.perf_counter() - sheet_started
+            result["sheets"].append(sheet)
+
+        result["blocks"] = sum(sheet["blocks"] for sheet in result["sheets"])
+        result["skipped"] = sum(sheet["skipped"] for sheet in result["sheets"])
+        if any(sheet["status"] == "error" for sheet in result["sheets"]):
+            result["status"] = "error"
+            result["error"] = "; ".join(f"{sheet['name']}: {sheet['error']}" for sheet in result["sheets"]
+                                        if sheet["status"] == "error")
+        elif not any(sheet["status"] == "ok" for sheet in result["sheets"]):
+            result["status"] = "skipped"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - started
+    result["process_seconds"] = result["seconds"] - result["load_seconds"]
+    return result
+
+
+def run_batch(entries, output_dir, workers=1, kind="auto", output_mode="per-file", bulk_format="csv", use_cache=False,
+              reader="auto"):
+    """Process the (path, sheet) entries, the largest workbooks first, and return their results in entry order."""
+    options = {"kind": kind, "output_mode": output_mode, "bulk_format": bulk_format, "use_cache": use_cache,
+               "reader": reader}
+    tasks = [(path, sheet, os.path.join(output_dir, name), options)
+             for (path, sheet), name in zip(entries, output_names(entries))]
+    # Starting the big files first keeps a long one from being left alone at the end of the run
+    order = sorted(range(len(tasks)), key=lambda i: -os.path.getsize(tasks[i][0]) if os.path.isfile(tasks[i][0]) else 0)
+
+    results = [None] * len(tasks)
+    if workers <= 1:
+        for i in order:
+            results[i] = process_workbook(tasks[i])
+            print_result(results[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_workbook, tasks[i]): i for i in order}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            print_result(results[i])
+    return results
+
+
+def print_result(result):
+    message = f"{result['status']:7} {result['path']}: {result['blocks']} blocks, {result['skipped']} skipped, {result['seconds']:.2f}s"
+    if result["error"]:
+        message += f" ({result['error']})"
+    print(message)
+
+
+def write_run_manifest(manifest_path, results, started, finished, workers):
+    manifest = {
+        "started": started.isoformat(timespec='seconds'),
+        "finished": finished.isoformat(timespec='seconds'),
+        "seconds": (finished - started).total_seconds(),
+        "workers": workers,
+        "files": results,
+        "totals": {status: sum(1 for result in results if result["status"] == status)
+                   for status in ("ok", "skipped", "error")},
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(manifest_path)), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract timecards and payrolls from many Excel files in one run.")
+    parser.add_argument("inputs", nargs='*', help="Excel or CSV/TSV files, directories or glob patterns")
+    parser.add_argument("--manifest", help="Text file with one 'path[,sheet]' per line")
+    parser.add_argument("--sheet", help="Sheet to extract from every file (default: every sheet)")
+    parser.add_argument("--kind", choices=KINDS, default="auto",
+                        help="Report in the sheets, detected from their content by default")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--output-dir", default="./generated_csv", help="Root folder of the generated files")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="per-file",
+                        help="Write a CSV per timecard and payroll, or single files; wide gives the header and payroll "
+                             "files the columns of the whole run")
+    parser.add_argument("--bulk-format", choices=BULK_FORMATS, default="csv",
+                        help="File format of the bulk output mode")
+    parser.add_argument("--run-manifest", help="Where to write the run report (default: run_manifest.json in the output folder)")
+    parser.add_argument("--reader", choices=READERS, default="auto",
+                        help="Backend reading the workbooks, calamine when installed and openpyxl otherwise")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the workbooks without the sheet cache")
+    args = parser.parse_args()
+
+    entries = collect_inputs(args.inputs, args.manifest, args.sheet)
+    if not entries:
+        parser.error("no input files found")
+
+    started = datetime.now()
+    results = run_batch(entries, args.output_dir, args.workers, args.kind, args.output_mode, args.bulk_format,
+                        use_cache=not args.no_cache, reader=args.reader)
+    finished = datetime.now()
+
+    manifest_path = args.run_manifest or os.path.join(args.output_dir, "run_manifest.json")
+    write_run_manifest(manifest_path, results, started, finished, args.workers)
+    failed = sum(1 for result in results if result["status"] == "error")
+    print(f"{len(results)} files, {failed} failed, {(finished - started).total_seconds():.2f}s. Run manifest: {manifest_path}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import argparse, sys, os, io, json, filecmp, shutil, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from instrumentation import instrument
+from sheet_reader import READERS, available_readers
+from synthetic_workbooks import write_timecards_workbook, write_payroll_workbook
+from table_output import BULK_FORMATS, OUTPUT_MODES
+from timecards_extractor import ExcelTableExtractor, extract_timecards, make_timecard_writer
+from payroll_extractor import PayrollDataExtractor, summarize_payroll, write_payrolls
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+WORK_DIR = os.path.join(tempfile.gettempdir(), "labor-calculations-benchmark")
+# CSVs of the original extractors on the seed 0 workbooks of GOLDEN_EMPLOYEES employees (the
+# smallest size with a cut-short timecard block)
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+GOLDEN_EMPLOYEES = 97
+
+
+def workbook_path(work_dir, kind, employees, seed):
+    """Generate the synthetic workbook on first use and return its path."""
+    path = os.path.join(work_dir, f"{kind}_{employees}_{seed}.xlsx")
+    if not os.path.exists(path):
+        os.makedirs(work_dir, exist_ok=True)
+        partial = path + ".partial.xlsx"
+        if kind == "timecards":
+            write_timecards_workbook(partial, employees, seed=seed)
+        else:
+            write_payroll_workbook(partial, employees, seed=seed)
+        os.replace(partial, path)
+    return path
+
+
+def make_output_dir(path):
+    for folder in ("headers", "details", "payrolls"):
+        os.makedirs(os.path.join(path, folder), exist_ok=True)
+    return path
+
+
+def extract(kind, file_path, output_path, options):
+    """Run one extraction like the command line does. Returns the number of blocks."""
+    if kind == "timecards":
+        extractor = ExcelTableExtractor(file_path, "Sheet1", streaming=options["streaming"],
+                                        use_cache=options["use_cache"], reader=options["reader"])
+        writer = make_timecard_writer(output_path, options["output_mode"], options["bulk_format"])
+        with writer:
+            blocks, skipped = extract_timecards(extractor, writer, options["workers"])
+        return blocks
+
+    extractor = PayrollDataExtractor(file_path, "3_payrolls", use_cache=options["use_cache"], reader=options["reader"])
+    extractor.clean_dataframe()
+    if options["vectorized"] or options["output_mode"] != "per-file":
+        rows = summarize_payroll(extractor.df)
+        instrument.count("blocks", len(rows))
+        return write_payrolls(rows, output_path, options["output_mode"], options["bulk_format"])
+    blocks = extractor.find_blocks()
+    for start, end in blocks:
+        extractor.extract_employee_data(start, end, output_path)
+    instrument.count("blocks", len(blocks))
+    return len(blocks)
+
+
+def run_case(case):
+    """Benchmark one (kind, employees) case with options["reader"]. Runs in a fresh process so its peak RSS is its own."""
+    kind, employees, file_path, options = case
+    instrument.reset()
+    instrument.enable(options["trace_memory"])
+    output_path = make_output_dir(tempfile.mkdtemp(prefix="bench-", dir=options["work_dir"]))
+    try:
+        started = time.perf_counter()
+        # The extractors print every skipped block and every payroll summary
+        with redirect_stdout(io.StringIO()):
+            blocks = extract(kind, file_path, output_path, options)
+        seconds = time.perf_counter() - started
+        report = instrument.report(seconds=seconds)
+    finally:
+        instrument.disable()
+        shutil.rmtree(output_path, ignore_errors=True)
+
+    rows = report["counters"].get("sheet_rows") or report["counters"].get("block_rows", 0)
+    load = report["stages"].get("load", {})
+    return {
+        "kind": kind,
+        "reader": options["reader"],
+        "employees": employees,
+        "blocks": blocks,
+        "rows": rows,
+        "seconds": seconds,
+        "blocks_per_second": blocks / seconds if seconds else None,
+        "rows_per_second": rows / seconds if seconds else None,
+        "load_seconds": load.get("seconds", 0.0),
+        "load_peak_bytes": load.get("peak_bytes"),
+        "peak_rss_bytes": report["peak_rss_bytes"],
+        "stages": report["stages"],
+        "counters": report["counters"],
+    }
+
+
+def compare_trees(expected, actual):
+    """Relative paths of the files missing from, extra in or different in `actual`."""
+    def files(root):
+        return {os.path.relpath(os.path.join(folder, name), root)
+                for folder, _, names in os.walk(root) for name in names}
+
+    expected_files, actual_files = files(expected), files(actual)
+    _, mismatch, errors = filecmp.cmpfiles(expected, actual, sorted(expected_files & actual_files), shallow=False)
+    return {"missing": sorted(expected_files - actual_files), "extra": sorted(actual_files - expected_files),
+            "different": sorted(mismatch + errors)}
+
+
+def check_golden(golden_dir, options, employees, seed, update=False):
+    """Extract the golden workbooks and compare the CSVs byte for byte with golden_dir. Returns True when equal.
+
+    Only the per-file output can be compared. With update, the golden CSVs are replaced by
+    the current output instead, so record them from a commit whose output is trusted.
+    """
+    if options["output_mode"] != "per-file":
+        raise ValueError("The golden CSVs are per-file output, they can't be compared with the "
+                         f"{options['output_mode']} output mode")
+    output_path = tempfile.mkdtemp(prefix="golden-", dir=options["work_dir"])
+    try:
+        for kind in ("timecards", "payroll"):
+            file_path = workbook_path(options["work_dir"], kind, employees, seed)
+            with redirect_stdout(io.StringIO()):
+                extract(kind, file_path, make_output_dir(os.path.join(output_path, kind)), options)
+        if update:
+            shutil.rmtree(golden_dir, ignore_errors=True)
+            shutil.copytree(output_path, golden_dir)
+            print(f"Golden CSVs written to {golden_dir}")
+            return True
+
+        differences = compare_trees(golden_dir, output_path)
+        for reason, paths in differences.items():
+            for path in paths[:20]:
+                print(f"Golden check: {reason} {path}")
+            if len(paths) > 20:
+                print(f"Golden check: ... {len(paths) - 20} more {reason} files")
+        ok = not any(differences.values())
+        print("Golden check passed" if ok else "Golden check FAILED")
+        return ok
+    finally:
+        shutil.rmtree(output_path, ignore_errors=True)
+
+
+def print_results(results):
+    print(f"{'kind':10} {'reader':9} {'employees':>9} {'blocks':>8} {'rows':>9} {'seconds':>9} {'load s':>8} "
+          f"{'blocks/s':>10} {'rows/s':>10} {'peak RSS':>10}")
+    for result in results:
+        print(f"{result['kind']:10} {result['reader']:9} {result['employees']:9d} {result['blocks']:8d} {result['rows']:9d} "
+              f"{result['seconds']:9.2f} {result['load_seconds']:8.2f} {result['blocks_per_second']:10.1f} "
+              f"{result['rows_per_second']:10.1f} {result['peak_rss_bytes'] / 1024 ** 2:8.1f}MB")
+        for name, stats in result["stages"].items():
+            peak = f", peak {stats['peak_bytes'] / 1024 ** 2:.1f}MB" if "peak_bytes" in stats else ""
+            print(f"    {name:18} {stats['seconds']:9.3f}s in {stats['calls']} calls{peak}")
+
+
+def fastest_readers(results):
+    """The reader with the lowest total load time for each kind of workbook."""
+    load_seconds = {}
+    for result in results:
+        kind = load_seconds.setdefault(result["kind"], {})
+        kind[result["reader"]] = kind.get(result["reader"], 0.0) + result["load_seconds"]
+    return {kind: min(readers, key=readers.get) for kind, readers in load_seconds.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the timecard and payroll extraction on synthetic workbooks.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES, help="Numbers of employees to benchmark")
+    parser.add_argument("--kinds", nargs='+', choices=("timecards", "payroll"), default=("timecards", "payroll"))
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic workbooks")
+    parser.add_argument("--work-dir", default=WORK_DIR, help="Where the synthetic workbooks are generated and kept")
+    parser.add_argument("--streaming", action="store_true", help="Extract the timecards in streaming mode")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to extract the timecard blocks")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="per-file")
+    parser.add_argument("--bulk-format", choices=BULK_FORMATS, default="csv")
+    parser.add_argument("--per-block", action="store_true",
+                        help="Summarize the payroll block by block instead of with the vectorized engine")
+    parser.add_argument("--readers", nargs='+', choices=READERS,
+                        help="Backends reading the workbooks to compare (default: every installed one)")
+    parser.add_argument("--cache", action="store_true", help="Read the workbooks through the sheet cache")
+    parser.add_argument("--memory", action="store_true", help="Trace the peak memory of every stage (slower)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--golden", metavar="DIR", nargs='?', const=GOLDEN_DIR,
+                        help="Compare the output on small workbooks with the CSVs in DIR (default: golden/)")
+    parser.add_argument("--update-golden", action="store_true", help="Record the golden CSVs in DIR instead")
+    parser.add_argument("--golden-employees", type=int, default=GOLDEN_EMPLOYEES,
+                        help="Employees in the golden workbooks")
+    args = parser.parse_args()
+    if args.golden and args.output_mode != "per-file":
+        parser.error("--golden compares the per-file CSVs, it can't be used with --output-mode " + args.output_mode)
+
+    options = {"streaming": args.streaming, "workers": args.workers, "output_mode": args.output_mode,
+               "bulk_format": args.bulk_format, "vectorized": not args.per_block, "use_cache": args.cache,
+               "trace_memory": args.memory, "work_dir": args.work_dir}
+    readers = args.readers or available_readers()
+    os.makedirs(args.work_dir, exist_ok=True)
+
+    if args.golden:
+        if args.update_golden:
+            # Recorded with the first reader, every reader must then give the same CSVs
+            readers = readers[:1]
+        ok = True
+        for reader in readers:
+            print(f"Reader {reader}:")
+            ok &= check_golden(args.golden, {**options, "reader": reader}, args.golden_employees, args.seed,
+                               update=args.update_golden)
+        if not ok:
+            sys.exit(1)
+        return
+
+    results = []
+    for employees in args.sizes:
+        for kind in args.kinds:
+            for reader in readers:
+                print(f"Benchmarking {kind} with {employees} employees, {reader} reader...")
+                case = (kind, employees, workbook_path(args.work_dir, kind, employees, args.seed),
+                        {**options, "reader": reader})
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    results.append(executor.submit(run_case, case).result())
+    print_results(results)
+    fastest = fastest_readers(results)
+    if len(readers) > 1:
+        for kind, reader in fastest.items():
+            print(f"Fastest reader for {kind}: {reader} (--reader {reader})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"options": {**options, "readers": readers}, "results": results, "fastest_readers": fastest},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse, os, json, shutil, signal, socketserver, threading, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from batch_extractor import KINDS, WORKBOOK_EXTENSIONS, process_workbook
+from sheet_reader import READERS
+from table_output import BULK_FORMATS, OUTPUT_MODES
+
+
+def _warm_up():
+    """Runs once in every worker, so the first job doesn't pay for starting the process."""
+    return os.getpid()
+
+
+class ExtractionService:
+    """A warm process pool that extracts workbooks as jobs come in, keeping latency and queue stats.
+
+    Jobs are run by batch_extractor.process_workbook, so a job's result is the same dict the
+    batch run manifest holds, plus its latency (from submission to result) and queue wait.
+    """
+
+    def __init__(self, output_dir, workers=1, options=None, metrics_path=None):
+        self.output_dir = output_dir
+        self.options = {"kind": "auto", "output_mode": "per-file", "bulk_format": "csv", "use_cache": False,
+                        "reader": "auto", **(options or {})}
+        self.metrics_path = metrics_path
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.latencies = deque(maxlen=1000)
+        self.executor = self._start_pool()
+
+    def _start_pool(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start every worker now instead of on the first jobs
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _restart_pool(self, broken):
+        """Replace the pool after a worker died (killed, out of memory), unless another thread already did."""
+        with self.lock:
+            if self.executor is not broken:
+                return
+            self.executor = self._start_pool()
+            self.restarts += 1
+        broken.shutdown(wait=False)
+        print(f"A worker died, restarted the pool of {self.workers} workers")
+
+    def submit(self, file_path, sheet_name=None, kind=None, on_done=None):
+        """Queue a workbook. Returns a Future of its result; on_done(result) is called when it finishes."""
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        options = self.options if kind is None else {**self.options, "kind": kind}
+        task = (file_path, sheet_name, os.path.join(self.output_dir, name), options)
+        submitted = time.perf_counter()
+        with self.lock:
+            self.queued += 1
+            depth = self.queued
+        try:
+            executor, future = self._submit(task)
+        except Exception:
+            with self.lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(lambda done: self._finish(done, executor, submitted, depth, on_done))
+        return future
+
+    def _submit(self, task):
+        executor = self.executor
+        try:
+            return executor, executor.submit(process_workbook, task)
+        except BrokenProcessPool:
+            # A worker died since the last job, the jobs it took down already failed in _finish
+            self._restart_pool(executor)
+            executor = self.executor
+            return executor, executor.submit(process_workbook, task)
+
+    def _finish(self, future, executor, submitted, depth, on_done):
+        latency = time.perf_counter() - submitted
+        try:
+            result = future.result()
+        except Exception as e:
+            # The worker died, process_workbook itself never raises
+            result = {"path": None, "status": "error", "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+            if isinstance(e, BrokenProcessPool):
+                # Not from this callback, it runs in the broken pool's own thread
+                threading.Thread(target=self._restart_pool, args=(executor,), daemon=True).start()
+        result["latency_seconds"] = latency
+        result["queue_seconds"] = max(latency - result["seconds"], 0.0)
+        with self.lock:
+            self.queued -= 1
+            self.completed += 1
+            self.failed += result["status"] == "error"
+            self.latencies.append(latency)
+            result["queue_depth"] = depth
+            result["queue_depth_after"] = self.queued
+
+        print(f"{result['status']:7} {result['path']}: {result.get('blocks', 0)} blocks, "
+              f"{latency * 1000:.0f} ms (queued {result['queue_seconds'] * 1000:.0f} ms), queue depth {result['queue_depth_after']}")
+        if self.metrics_path:
+            with self.lock, open(self.metrics_path, 'a') as f:
+                f.write(json.dumps(result, default=str) + "\n")
+        if on_done is not None:
+            on_done(result)
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {"queue_depth": self.queued, "completed": self.completed, "failed": self.failed,
+                     "restarts": self.restarts}
+        if latencies:
+            stats["latency_ms"] = {"mean": 1000 * sum(latencies) / len(latencies),
+                                   "p50": 1000 * latencies[len(latencies) // 2],
+                                   "p95": 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                                   "max": 1000 * latencies[-1]}
+        return stats
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def watch_folder(service, inbox, stop, poll_interval=1.0):
+    """Submit every workbook that lands in the inbox, then move it to inbox/done or inbox/failed.
+
+    A file is only picked up once its size and modification time are the same on two polls
+    in a row, so a workbook still being copied is left alone.
+    """
+    done_dir, failed_dir = os.path.join(inbox, "done"), os.path.join(inbox, "failed")
+    os.makedirs(done_dir, exist_ok=True)
+    os.makedirs(failed_dir, exist_ok=True)
+    last_seen, in_flight = {}, set()
+
+    def move(result, path):
+        target = done_dir if result["status"] != "error" else failed_dir
+        try:
+            shutil.move(path, os.path.join(target, os.path.basename(path)))
+        except OSError as e:
+            print(f"Could not move {path}: {e}")
+        in_flight.discard(path)
+
+    while not stop.is_set():
+        seen = {}
+        for entry in os.scandir(inbox):
+            if (not entry.is_file() or not entry.name.lower().endswith(WORKBOOK_EXTENSIONS)
+                    or entry.name.startswith(('~$', '.'))):
+                continue
+            stat = entry.stat()
+            seen[entry.path] = (stat.st_size, stat.st_mtime)
+            if entry.path not in in_flight and last_seen.get(entry.path) == seen[entry.path]:
+                in_flight.add(entry.path)
+                try:
+                    service.submit(entry.path, on_done=lambda result, path=entry.path: move(result, path))
+                except Exception as e:
+                    # Picked up again on the next poll
+                    print(f"Could not submit {entry.path}: {type(e).__name__}: {e}")
+                    in_flight.discard(entry.path)
+        last_seen = seen
+        stop.wait(poll_interval)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """One JSON request per line: {"path": ..., "sheet": ..., "kind": ...} runs a job and answers
+    with its result, {"command": "stats"} answers with the service stats."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                if request.get("command") == "stats":
+                    response = self.server.service.stats()
+                elif "path" in request:
+                    # Answer once the done callback has finished with the result, not when the future is done
+                    finished, results = threading.Event(), []
+                    self.server.service.submit(request["path"], request.get("sheet"), request.get("kind"),
+                                               on_done=lambda result: (results.append(result), finished.set()))
+                    finished.wait()
+                    response = results[0]
+                else:
+                    response = {"status": "error", "error": "expected a 'path' or a 'command'"}
+            except Exception as e:
+                response = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response, default=str) + "\n").encode())
+            self.wfile.flush()
+
+
+class _JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_socket(service, socket_path):
+    """Accept jobs on a local Unix socket in a background thread. Returns the server."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = _JobServer(socket_path, _JobHandler)
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a warm extraction service running for incoming workbooks.")
+    parser.add_argument("--inbox", help="Folder to watch for new workbooks")
+    parser.add_argument("--socket", help="Path of a Unix socket to accept jobs on")
+    parser.add_argument("--output-dir", default="./generated_csv", help="Root folder of the generated files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--kind", choices=KINDS, default="auto", help="Report in the sheets, detected by default")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="per-file")
+    parser.add_argument("--bulk-format", choices=BULK_FORMATS, default="csv")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between two scans of the inbox")
+    parser.add_argument("--metrics", help="Append every job's result, latency and queue depth to this JSON lines file")
+    parser.add_argument("--reader", choices=READERS, default="auto", help="Backend reading the workbooks")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the workbooks without the sheet cache")
+    args = parser.parse_args()
+
+    if not args.inbox and not args.socket:
+        parser.error("give an --inbox to watch, a --socket to listen on, or both")
+
+    options = {"kind": args.kind, "output_mode": args.output_mode, "bulk_format": args.bulk_format,
+               "use_cache": not args.no_cache, "reader": args.reader}
+    service = ExtractionService(args.output_dir, args.workers, options, args.metrics)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    server = serve_socket(service, args.socket) if args.socket else None
+    print(f"Extraction service ready with {args.workers} workers"
+          + (f", watching {args.inbox}" if args.inbox else "") + (f", listening on {args.socket}" if args.socket else ""))
+    try:
+        if args.inbox:
+            watch_folder(service, args.inbox, stop, args.poll_interval)
+        else:
+            stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            os.remove(args.socket)
+        service.shutdown()
+        print(f"Stopped: {json.dumps(service.stats())}")
+
+
+if __name__ == "__main__":
+    main()
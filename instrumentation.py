@@ -0,0 +1,171 @@
+import cProfile, functools, json, os, resource, sys, time, tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+
+class Instrumentation:
+    """Per-stage wall time, call counts and peak memory, plus counters and skipped blocks.
+
+    Disabled by default, in which case stage() and timed() cost a flag check. Peak memory is
+    only traced when enabled with trace_memory=True, as tracemalloc slows everything down.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.reset()
+
+    def reset(self):
+        self.stages = {}
+        self.counters = {}
+        self.skipped = []
+        self._stack = []
+
+    def enable(self, trace_memory=False):
+        self.enabled = True
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = False
+        self.trace_memory = False
+
+    def stage(self, name):
+        """Context manager adding the time spent in the block to the stage `name`."""
+        if not self.enabled:
+            return nullcontext()
+        return self._stage(name)
+
+    def timed(self, name):
+        """Decorator recording every call of the function as the stage `name`."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self._stage(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def timed_iter(self, name, iterable):
+        """Yield from iterable, recording the time spent producing each item as the stage `name`."""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    @contextmanager
+    def _stage(self, name):
+        # Each open stage keeps the highest peak seen by the stages nested in it, since
+        # tracemalloc has a single peak that every stage resets on entry
+        frame = [0, 0]
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, 0]
+        self._stack.append(frame)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._stack.pop()
+            stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_bytes": 0})
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+                stats["peak_bytes"] = max(stats["peak_bytes"], peak - frame[0])
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def skip(self, stage, reason, **where):
+        """Record a skipped block, with where it is (block, rows...) and why it was skipped."""
+        if self.enabled:
+            self.skipped.append({**where, "stage": stage, "reason": reason})
+
+    def snapshot(self):
+        """Picklable copy of what was recorded, to send back from a worker process."""
+        return {"stages": self.stages, "counters": self.counters, "skipped": self.skipped}
+
+    def merge(self, snapshot):
+        """Add the records of a worker process. Peaks are per process, so the largest one is kept."""
+        for name, other in snapshot["stages"].items():
+            stats = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "peak_bytes": 0})
+            stats["calls"] += other["calls"]
+            stats["seconds"] += other["seconds"]
+            stats["peak_bytes"] = max(stats["peak_bytes"], other["peak_bytes"])
+        for name, n in snapshot["counters"].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+        self.skipped.extend(snapshot["skipped"])
+
+    def report(self, **extra):
+        report = {
+            "command": sys.argv,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "memory_traced": self.trace_memory,
+            **extra,
+            "stages": self.stages,
+            "counters": self.counters,
+            "skipped": self.skipped,
+        }
+        if not self.trace_memory:
+            report["stages"] = {name: {key: value for key, value in stats.items() if key != "peak_bytes"}
+                                for name, stats in self.stages.items()}
+        return report
+
+    def write_report(self, path, **extra):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(**extra), f, indent=2, default=str)
+
+
+instrument = Instrumentation()
+
+
+@contextmanager
+def instrumented_run(report_path=None, profile_path=None, trace_memory=False):
+    """Enable the instrumentation for the duration of a run and write its JSON report and cProfile dump.
+
+    Both files are written even when the run fails, so a failing production run can be looked at.
+    """
+    if report_path:
+        instrument.enable(trace_memory)
+    profiler = cProfile.Profile() if profile_path else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield instrument
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+        if report_path:
+            instrument.write_report(report_path, seconds=time.perf_counter() - started)
+            instrument.disable()
+
+
+def add_instrumentation_arguments(parser):
+    parser.add_argument("--report", metavar="PATH", help="Write a JSON report of the time spent in every stage")
+    parser.add_argument("--report-memory", action="store_true",
+                        help="Also trace the peak memory of every stage in the report (slower)")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Write a cProfile dump of the run (main process only)")
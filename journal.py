@@ -0,0 +1,155 @@
+import pandas as pd
+import hashlib, json, os
+from collections import Counter
+from datetime import date, datetime
+
+# A skipped block can't be extracted from its content, so it is only retried once that changes.
+# A failed write depends on the environment (missing folder, full disk, permissions) and is
+# always retried.
+DONE_STATUSES = ("written", "skipped")
+
+
+def _canonical(value):
+    # The same cell can come back as 4 or 4.0, or as a datetime or a Timestamp, depending
+    # on whether the block was streamed or sliced from the whole sheet
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) or hasattr(value, 'dtype'):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return str(value)
+    if isinstance(value, (datetime, date)):
+        return pd.Timestamp(value).isoformat()
+    return str(value)
+
+
+def block_fingerprint(timecard_df):
+    """SHA-1 of the cell values of a block, ignoring its position in the sheet and trailing empty cells."""
+    digest = hashlib.sha1()
+    for row in timecard_df.itertuples(index=False, name=None):
+        values = [_canonical(value) for value in row]
+        while values and values[-1] is None:
+            values.pop()
+        digest.update(repr(values).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _entry_key(entry):
+    return entry["workbook"], entry["sheet"], entry["fingerprint"], entry["occurrence"]
+
+
+class BlockJournal:
+    """Append-only record of the timecard blocks of a run: workbook, sheet, fingerprint, status and output files.
+
+    Every block is written to the JSON lines file as soon as it is done, so after a crash a
+    rerun can skip the blocks whose content and output files are unchanged. Blocks are keyed
+    by workbook, sheet and content (and which of the identical blocks it is), not by position,
+    so a block inserted or removed upstream doesn't make the blocks after it new. The last
+    entry of a block wins, and a line cut short by the crash is ignored.
+
+    Files an entry recorded are deleted once no entry holds them any more: when its block is
+    rewritten to other files, or by prune() when its block is gone from the sheet.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.resumed = 0
+        self._pending = {}
+        self._seen = set()
+        self._owners = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        key = _entry_key(entry)
+                    except (ValueError, KeyError):
+                        # Cut short by a crash, or written before blocks were keyed by content
+                        continue
+                    self._set(key, None if entry["status"] == "removed" else entry)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'a')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _set(self, key, entry):
+        """Replace the entry of a block (None removes it). Returns the files no entry holds any more."""
+        old = self.entries.pop(key, None)
+        released = []
+        if old is not None:
+            for path in old["files"]:
+                if self._owners.get(path) == key:
+                    del self._owners[path]
+                    released.append(path)
+        if entry is not None:
+            self.entries[key] = entry
+            self._owners.update((path, key) for path in entry["files"])
+        return [path for path in released if path not in self._owners]
+
+    def _write(self, key, entry):
+        for path in self._set(key, entry):
+            if os.path.exists(path):
+                os.remove(path)
+        workbook, sheet, fingerprint, occurrence = key
+        line = entry or {"workbook": workbook, "sheet": sheet, "fingerprint": fingerprint, "occurrence": occurrence,
+                         "status": "removed"}
+        self.file.write(json.dumps(line) + "\n")
+        self.file.flush()
+
+    def is_done(self, key):
+        """Whether the block was already written or skipped with the same content and its files are still there."""
+        entry = self.entries.get(key)
+        if entry is None or entry["status"] not in DONE_STATUSES:
+            return False
+        return all(os.path.exists(path) for path in entry["files"])
+
+    def pending(self, jobs):
+        """Filter the process_timecard_job jobs down to the blocks that are new or changed."""
+        occurrences = Counter()
+        for job in jobs:
+            file_path, sheet_name, index, timecard_df = job[0], job[1], job[2], job[5]
+            fingerprint = block_fingerprint(timecard_df)
+            scope = (os.path.basename(file_path), sheet_name)
+            key = scope + (fingerprint, occurrences[scope + (fingerprint,)])
+            occurrences[scope + (fingerprint,)] += 1
+            self._seen.add(key)
+            if self.is_done(key):
+                self.resumed += 1
+                continue
+            self._pending[index] = key
+            yield job
+
+    def record(self, index, start, end, status, files=(), error=None):
+        """Write the outcome of a block that went through pending()."""
+        workbook, sheet, fingerprint, occurrence = key = self._pending.pop(index)
+        # A block whose name matches a kept block's files overwrote them, so that one is redone next time
+        overwritten = {self._owners[path] for path in files if self._owners.get(path, key) != key}
+        entry = {"workbook": workbook, "sheet": sheet, "fingerprint": fingerprint, "occurrence": occurrence,
+                 "index": index, "start": int(start), "end": int(end), "status": status, "files": list(files),
+                 "error": error}
+        self._write(key, entry)
+        for other in overwritten:
+            self._write(other, None)
+
+    def prune(self, file_path, sheet_name):
+        """Drop the entries of the sheet whose blocks were not seen by pending(), deleting their files.
+
+        Call it once every block of the sheet went through pending(), never after a run cut short.
+        """
+        scope = (os.path.basename(file_path), sheet_name)
+        gone = [key for key in self.entries if key[:2] == scope and key not in self._seen]
+        for key in gone:
+            self._write(key, None)
+        return len(gone)
+
+    def close(self):
+        self.file.close()
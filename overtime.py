@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+import argparse, sys, os
+from sheet_reader import READERS
+from timecards_extractor import ExcelTableExtractor, build_timecard_header_record
+
+DAILY_OT_THRESHOLD = 8
+DAILY_DT_THRESHOLD = 12
+WEEKLY_OT_THRESHOLD = 40
+SEVENTH_DAY_DT_THRESHOLD = 8
+PAYCODES = ["REG", "OT", "DT"]
+
+
+def collect_timecard_details(extractor):
+    """Details tables of every timecard of the sheet in one frame, with the employee and timecard label.
+
+    Also returns the summary paycodes of every timecard (employee, timecardLabel, EQUIV, HOURS).
+    Blocks that can't be extracted are left out, like the CSV extraction does.
+    """
+    details, summaries = [], []
+    for start, end, timecard_df in extractor.iter_blocks():
+        try:
+            table_summary, table_details, table_totals, additional_info = extractor.extract_block(timecard_df)
+            header = build_timecard_header_record(additional_info, table_summary)
+        except Exception as e:
+            print(f"Skipping block (rows {start} to {end}): {type(e).__name__}: {e}")
+            continue
+        keys = {"employee": header.employee, "timecardLabel": header.label}
+        details.append(table_details[["DATE", "HOURS", "DAY_TOTALS"]].assign(**keys))
+        summaries.append(table_summary[["EQUIV", "HOURS"]].assign(**keys))
+
+    if not details:
+        empty = pd.DataFrame(columns=["DATE", "HOURS", "DAY_TOTALS", "employee", "timecardLabel"])
+        return empty, pd.DataFrame(columns=["EQUIV", "HOURS", "employee", "timecardLabel"])
+    return pd.concat(details, ignore_index=True), pd.concat(summaries, ignore_index=True)
+
+
+def daily_hours(details):
+    """Hours worked per employee and day. Rows without a date or numeric hours (notes) are left out."""
+    dates = details["DATE"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        # Numbers are not dates (to_datetime would take them as epoch offsets), and text is one only in ISO format
+        dates = pd.to_datetime(dates.where(pd.to_numeric(dates, errors='coerce').isna()), errors='coerce',
+                               format='ISO8601')
+    dates = dates.dt.normalize()
+    hours = pd.to_numeric(details["HOURS"], errors='coerce')
+    worked = dates.notna() & hours.notna()
+    frame = pd.DataFrame({"employee": details["employee"][worked], "date": dates[worked], "hours": hours[worked]})
+    return frame.groupby(["employee", "date"], sort=True, as_index=False)["hours"].sum()
+
+
+def calculate_overtime(details, week_start=0):
+    """California REG/OT/DT hours per employee and day, for all employees at once.
+
+    `details` has the DATE and HOURS columns of the timecard details tables plus an employee
+    column, see collect_timecard_details(). Workweeks start on `week_start` (0 is Monday).
+    The rules, in order:
+      - a day's first 8 hours are REG, hours 8 to 12 are OT and hours over 12 are DT;
+      - on the 7th consecutive day worked in a workweek, the first 8 hours are OT and the rest DT;
+      - REG hours past 40 in the workweek are paid as OT (daily OT doesn't count toward the 40).
+    Returns one row per employee and day with its week (first day of the workweek), hours,
+    seventhDay flag and the REG, OT and DT hours.
+    """
+    daily = daily_hours(details)
+    hours = daily["hours"].to_numpy(dtype=float)
+    weekday = ((daily["date"].dt.dayofweek - week_start) % 7).to_numpy()
+    daily["week"] = daily["date"] - pd.to_timedelta(weekday, unit='D')
+
+    # 7th consecutive day: every day of the workweek was worked and this is the last one
+    worked = hours > 0
+    days_worked = pd.Series(worked).groupby([daily["employee"], daily["week"]]).transform('sum').to_numpy()
+    seventh_day = worked & (weekday == 6) & (days_worked == 7)
+
+    reg = np.where(seventh_day, 0, np.clip(hours, 0, DAILY_OT_THRESHOLD))
+    ot = np.where(seventh_day, np.clip(hours, 0, SEVENTH_DAY_DT_THRESHOLD),
+                  np.clip(hours - DAILY_OT_THRESHOLD, 0, DAILY_DT_THRESHOLD - DAILY_OT_THRESHOLD))
+    dt = np.where(seventh_day, np.clip(hours - SEVENTH_DAY_DT_THRESHOLD, 0, None),
+                  np.clip(hours - DAILY_DT_THRESHOLD, 0, None))
+
+    # Weekly overtime: the part of each day's REG hours past 40 REG hours in its workweek
+    weekly_reg = pd.Series(reg).groupby([daily["employee"], daily["week"]]).cumsum().to_numpy()
+    over_40 = np.clip(weekly_reg - np.maximum(weekly_reg - reg, WEEKLY_OT_THRESHOLD), 0, None)
+
+    daily["seventhDay"] = seventh_day
+    daily["REG"] = reg - over_40
+    daily["OT"] = ot + over_40
+    daily["DT"] = dt
+    return daily[["employee", "date", "week", "hours", "seventhDay", "REG", "OT", "DT"]]
+
+
+def summarize_by_week(daily):
+    """REG/OT/DT hours per employee and workweek."""
+    return daily.groupby(["employee", "week"], as_index=False)[["hours"] + PAYCODES].sum()
+
+
+def summarize_by_employee(daily):
+    """REG/OT/DT hours per employee over the whole pay period."""
+    return daily.groupby("employee", as_index=False)[["hours"] + PAYCODES].sum()
+
+
+def compare_with_summary(by_employee, summaries, tolerance=0.01):
+    """Calculated REG/OT/DT hours of every employee next to the ones reported in the timecard summaries.
+
+    Returns the employees where any paycode differs by more than `tolerance` hours, with
+    calculated and reported hours and their difference for each paycode.
+    """
+    reported = summaries[summaries["EQUIV"].isin(PAYCODES)].assign(
+        HOURS=pd.to_numeric(summaries["HOURS"], errors='coerce'))
+    reported = reported.pivot_table(index="employee", columns="EQUIV", values="HOURS", aggfunc='sum', observed=True)
+    reported = reported.reindex(columns=PAYCODES)
+
+    merged = by_employee.set_index("employee")[PAYCODES].join(reported, how='outer', rsuffix="_reported")
+    merged = merged.fillna(0)
+    mismatch = np.zeros(len(merged), dtype=bool)
+    for paycode in PAYCODES:
+        merged[f"{paycode}_difference"] = merged[paycode] - merged[f"{paycode}_reported"]
+        mismatch |= (merged[f"{paycode}_difference"].abs() > tolerance).to_numpy()
+    columns = [f"{paycode}{suffix}" for paycode in PAYCODES for suffix in ("", "_reported", "_difference")]
+    return merged.loc[mismatch, columns].reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calculate California REG/OT/DT hours from the timecard details.")
+    parser.add_argument("file_path", help="Path to the Excel file")
+    parser.add_argument("sheet_name", nargs='?', default="Sheet1", help="Name of the timecards sheet")
+    parser.add_argument("--week-start", type=int, default=0, help="First day of the workweek, 0 is Monday")
+    parser.add_argument("--by", choices=("day", "week", "employee"), default="week",
+                        help="Level of the calculated hours that are written")
+    parser.add_argument("--compare", action="store_true",
+                        help="Write the employees whose reported REG/OT/DT hours differ from the calculated ones")
+    parser.add_argument("--output", default="./generated_csv/Overtime.csv", help="Path of the CSV to write")
+    parser.add_argument("--reader", choices=READERS, default="auto", help="Backend reading the sheet")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the workbook without the sheet cache")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file_path):
+        print(f"File Error: The file '{args.file_path}' does not exist.")
+        sys.exit(1)
+
+    extractor = ExcelTableExtractor(args.file_path, args.sheet_name, use_cache=not args.no_cache, reader=args.reader)
+    details, summaries = collect_timecard_details(extractor)
+    daily = calculate_overtime(details, args.week_start)
+
+    if args.compare:
+        result = compare_with_summary(summarize_by_employee(daily), summaries)
+    elif args.by == "day":
+        result = daily
+    elif args.by == "week":
+        result = summarize_by_week(daily)
+    else:
+        result = summarize_by_employee(daily)
+    result.to_csv(args.output, index=False)
+    print(f"Wrote {len(result)} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
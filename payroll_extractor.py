@@ -1,14 +1,27 @@
+import numpy as np
 import pandas as pd
-import sys, re, csv
+import argparse, sys, re, csv
 from collections import defaultdict
+from sheet_cache import read_excel_cached, clear_cache
+from sheet_reader import READERS
+from instrumentation import instrument, instrumented_run, add_instrumentation_arguments
+from records import PAYROLL_BULK_FIELDS, PayrollRecord
+from table_output import BULK_FORMATS, OUTPUT_MODES, WideTable, open_sink
 
 
 class PayrollDataExtractor:
-    def __init__(self, file_path, sheet_name):
+    def __init__(self, file_path, sheet_name, use_cache=False, df=None, reader="auto"):
         self.file_path = file_path
         self.sheet_name = sheet_name if sheet_name else "Sheet1"
+        self._segments = None
+        if df is not None:
+            # Sheet already loaded by the caller, e.g. with the other sheets of its workbook
+            self.df = df
+            return
         try:
-            self.df = pd.read_excel(file_path, sheet_name=self.sheet_name, header=None)
+            with instrument.stage("load"):
+                self.df = read_excel_cached(file_path, self.sheet_name, use_cache=use_cache, reader=reader)
+            instrument.count("sheet_rows", len(self.df))
         except (FileNotFoundError, IsADirectoryError, PermissionError) as e:
             print(f"Error opening file: {str(e)}")
             sys.exit(1)  # Exit the program
@@ -19,154 +32,248 @@ class PayrollDataExtractor:
     def clean_dataframe(self):
         self.df.dropna(axis=0, how='all', inplace=True)
         self.df.dropna(axis=1, how='all', inplace=True)
+        self._segments = None
+
+    @property
+    def segments(self):
+        """(block_ids, blocks) of segment_payroll_blocks() for the sheet, computed on first use."""
+        if self._segments is None:
+            self._segments = segment_payroll_blocks(self.df)
+        return self._segments
+
+    def find_blocks(self):
+        """(start, end) row labels of every employee block, both inclusive."""
+        blocks = self.segments[1]
+        return list(zip(blocks["start"], blocks["end"]))
+
+    def iter_payrolls(self):
+        """Lazily yield the PayrollRecord of every employee of the sheet, without writing any file."""
+        self.clean_dataframe()
+        yield from iter_payroll_records(self.df)
+
+    def __iter__(self):
+        return self.iter_payrolls()
+
+    def extract_employee_data(self, start, end, output_path="./generated_csv"):
+        """Summarize the employee block of rows start to end and write its payroll CSV.
+
+        (start, end) are the block's first and last row labels, as given by find_blocks(). The
+        block is a view of the sheet, its file number and rate come from the segmentation of
+        the whole sheet.
+        """
+        block_ids, blocks = self.segments
+        block_id = block_ids.get(start, 0)
+        if block_id == 0 or blocks.at[block_id, "start"] != start or blocks.at[block_id, "end"] != end:
+            raise ValueError(f"Rows {start} to {end} are not an employee block, see find_blocks()")
+        block = blocks.loc[block_id]
+        payroll_df = self.df.iloc[block["first"]:block["stop"]]
+        create_summary(payroll_df, block["file_number"], block["rate"], output_path)
+        return payroll_df
 
-    def extract_employee_data(self, start, end):
-        payroll_df = self.df.loc[start:end + 1].copy()
-
-        # Identifying rows that contain 'Associate ID' keyword
-        payroll_df['is_associate'] = payroll_df[0].astype(str).str.contains('Associate ID')
-
-        # Propagate the 'File Number' forward to get file number for all rows
-        payroll_df['File Number'] = payroll_df.loc[payroll_df['is_associate'], 0].str.extract(r'File #: (\d+)',
-                                                                                              expand=False)
-        payroll_df['File Number'].ffill(inplace=True)  # Use ffill instead of fillna with method
-
-        # Drop the column 'is_associate' as it's no longer needed
-        payroll_df.drop(columns=['is_associate'], inplace=True)
-
-        # Reordering columns to place 'File Number' first
-        columns = list(payroll_df.columns)
-        columns = [columns[-1]] + columns[:-1]
-        payroll_df = payroll_df[columns]
-
-        create_summary(payroll_df)
 
-        return payroll_df
+def create_summary(payroll_df, file_number, rate, output_path="./generated_csv"):
+    write_payroll_csv(summarize_employee(payroll_df, file_number, rate), output_path)
 
 
-def create_summary(payroll_df):
+@instrument.timed("table_extraction")
+def summarize_employee(payroll_df, file_number, rate):
+    """Print the summary of one employee block and return its PayrollRecord."""
     print("\n------ Summary ------")
-    print(f"File Number: {payroll_df['File Number'].iloc[0]}")
-
-    rate_str = payroll_df.iloc[0][0]
-    match = re.search(r'Rate: (\d+\.\d+)', rate_str)
-    rate = match.group(1) if match else "Not Found"
+    print(f"File Number: {file_number}")
     print(f"Rate: {rate}")
-    
+
     gross = payroll_df.iloc[0][8]
     print(f"Gross: {gross}")
 
-    # Define Payroll Label
-    payroll_label = f"EP{payroll_df['File Number'].iloc[0]} - 2023/10/02 - 2023/10/15"
-    # Initialize CSV row data
-    csv_data = {
-        "company": "Case HM LLC",
-        "employee": f"EP1{payroll_df['File Number'].iloc[0]}",
-        "dateFrom": "2023-10-02",  # Assuming fixed
-        "rate": rate,
-        "gross": gross,
-    }
-
     # Parse and sum the voluntary deductions
     voluntary_deductions = parse_and_sum_keyed_financial_values(payroll_df[11])
-    # Iterate over the voluntary deductions and add them to the CSV data
-    i = 0
     for key, total in voluntary_deductions.items():
         key = key.replace("\n", " ")
         print(f"Voluntary Deduction -- '{key}': {total}")
-        csv_data[f"voluntaryDeductions[{i}].detail"] = key
-        csv_data[f"voluntaryDeductions[{i}].amount"] = total
-        i += 1
 
-    # Parse and sum the voluntary deductions
+    # Parse and sum the net pay
     net_pay = parse_and_sum_keyed_financial_values(payroll_df[12])
-    # Iterate over the voluntary deductions and add them to the CSV data
     for key, total in net_pay.items():
         key = key.replace("\n", " ")
         print(f"Net Pay -- '{key}': {total}")
-        csv_data[f"netPay.detail"] = key
-        csv_data[f"netPay.amount"] = total
 
     total_worked_hours = payroll_df.iloc[-1][1]
     total_worked_hours = extract_number_after_colon(total_worked_hours)
     print(f"Total Worked Hours: {total_worked_hours}")
-    csv_data[f"totalHs"] = total_worked_hours
 
     # SUMMARY HOURS
-    summary = dict()
-    payroll_df[1] = pd.to_numeric(payroll_df[1], errors='coerce')
-    regular_hours = payroll_df[1].sum()
+    regular_hours = pd.to_numeric(payroll_df[1], errors='coerce').sum()
     print(f"Total Regular Hours: {regular_hours}")
 
-    payroll_df[4] = pd.to_numeric(payroll_df[4], errors='coerce')
-    regular_earnings = payroll_df[4].sum()
+    regular_earnings = pd.to_numeric(payroll_df[4], errors='coerce').sum()
     print(f"Total Regular Earnings: {regular_earnings}")
-    summary["REG"] = {"hours": regular_hours, "total": regular_earnings}
 
-    payroll_df[2] = pd.to_numeric(payroll_df[2], errors='coerce')
-    overtime_hours = payroll_df[2].sum()
+    overtime_hours = pd.to_numeric(payroll_df[2], errors='coerce').sum()
     print(f"Total Overtime Hours: {overtime_hours}")
 
-    payroll_df[5] = pd.to_numeric(payroll_df[5], errors='coerce')
-    overtime_earnings = payroll_df[5].sum()
+    overtime_earnings = pd.to_numeric(payroll_df[5], errors='coerce').sum()
     print(f"Total Overtime Earnings: {overtime_earnings}")
-    summary["OT"] = {"hours": overtime_hours, "total": overtime_earnings}
 
     # Calculate the sums for each key in paycode hours
     paycode_hours_sums = parse_and_sum_values(payroll_df[3])
     for key, total in paycode_hours_sums.items():
         print(f"Total Hours for {key}: {total}")
-        summary[key] = {"hours": total, "total": ""}
 
     # Calculate the sums for each key in paycode earnings
     paycode_earnings_sums = parse_and_sum_values(payroll_df[6])
     for key, total in paycode_earnings_sums.items():
         print(f"Total Earnings for {key}: {total}")
-        if key not in summary:
-            summary[key] = {}
-        if "total" not in summary[key]:
-            summary[key]["total"] = 0
-        summary[key]["total"] = total
 
-    i = 0
-    for key, values in summary.items():
-        csv_data[f"summary[{i}].paycode"] = key
-        csv_data[f"summary[{i}].hours"] = values.get("hours", "")
-        csv_data[f"summary[{i}].total"] = values.get("total", "")
-        i += 1
+    summary = merge_summary(regular_hours, regular_earnings, overtime_hours, overtime_earnings,
+                            paycode_hours_sums, paycode_earnings_sums)
 
-    deductions = dict()
     # Calculate the sums for each key in federal taxes
     federal_taxes = parse_and_sum_values(payroll_df[9])
     for key, total in federal_taxes.items():
         print(f"Federal Tax rate {key}: {total}")
-        deductions[key] = {"tax_type": "Federal", "total": total}
-
 
     # Calculate the sums for each key in local taxes
     local_taxes = parse_and_sum_values(payroll_df[10])
     for key, total in local_taxes.items():
         print(f"Local Tax rate {key}: {total}")
-        deductions[key] = {"tax_type": "Local/State", "total": total}
-
-    i = 0
-    for key, values in deductions.items():
-        csv_data[f"deductions[{i}].code"] = key
-        csv_data[f"deductions[{i}].type"] = values["tax_type"]
-        csv_data[f"deductions[{i}].rate"] = values["total"]
-        i += 1
 
-    csv_data[f"memos"] = ""
-    csv_data[f"payrollLabel"] = payroll_label
+    deductions = merge_deductions(federal_taxes, local_taxes)
 
     print("\n\n")
 
+    return build_payroll_record(file_number, rate, gross, voluntary_deductions, net_pay, total_worked_hours, summary,
+                                deductions)
+
 
+def merge_summary(regular_hours, regular_earnings, overtime_hours, overtime_earnings, paycode_hours, paycode_earnings):
+    summary = dict()
+    summary["REG"] = {"hours": regular_hours, "total": regular_earnings}
+    summary["OT"] = {"hours": overtime_hours, "total": overtime_earnings}
+    for key, total in paycode_hours.items():
+        summary[key] = {"hours": total, "total": ""}
+    for key, total in paycode_earnings.items():
+        if key not in summary:
+            summary[key] = {}
+        if "total" not in summary[key]:
+            summary[key]["total"] = 0
+        summary[key]["total"] = total
+    return summary
+
+
+def merge_deductions(federal_taxes, local_taxes):
+    deductions = dict()
+    for key, total in federal_taxes.items():
+        deductions[key] = {"tax_type": "Federal", "total": total}
+    for key, total in local_taxes.items():
+        deductions[key] = {"tax_type": "Local/State", "total": total}
+    return deductions
+
+
+def build_payroll_record(file_number, rate, gross, voluntary_deductions, net_pay, total_worked_hours, summary,
+                         deductions):
+    """Lay out the payroll CSV row of one employee."""
+    # Only the last net pay line is kept, like the single netPay column pair of the CSV
+    last_net_pay = None
+    for key, total in net_pay.items():
+        last_net_pay = (key.replace("\n", " "), total)
+
+    return PayrollRecord(
+        company="Case HM LLC",
+        employee=f"EP1{file_number}",
+        date_from="2023-10-02",  # Assuming fixed
+        rate=rate,
+        gross=gross,
+        voluntary_deductions=tuple((key.replace("\n", " "), total) for key, total in voluntary_deductions.items()),
+        net_pay=last_net_pay,
+        total_hours=total_worked_hours,
+        summary=tuple((key, values.get("hours", ""), values.get("total", "")) for key, values in summary.items()),
+        deductions=tuple((key, values["tax_type"], values["total"]) for key, values in deductions.items()),
+        memos="",
+        # Define Payroll Label
+        label=f"EP{file_number} - 2023/10/02 - 2023/10/15",
+    )
+
+
+@instrument.timed("csv_writing")
+def write_payroll_csv(csv_data, output_path="./generated_csv"):
+    """Write a PayrollRecord, or a csv_data dict, to its own CSV."""
+    if isinstance(csv_data, PayrollRecord):
+        label, fieldnames, values = csv_data.label, csv_data.fieldnames(), csv_data.values()
+    else:
+        label, fieldnames, values = csv_data['payrollLabel'], list(csv_data.keys()), list(csv_data.values())
     # Write the CSV row
-    with open(f"./generated_csv/payrolls/{payroll_label.replace('/', '-')}.csv", 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=csv_data.keys())
-        writer.writeheader()
-        writer.writerow(csv_data)
+    with open(f"{output_path}/payrolls/{label.replace('/', '-')}.csv", 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        writer.writerow(values)
+
+
+class BulkPayrollWriter:
+    """Writes every employee's payroll to a single file under the output path.
+
+    The default long layout has a row per voluntary deduction, net pay, summary paycode and
+    tax (PAYROLL_BULK_FIELDS, Payrolls.<format>). The wide layout has a row per employee laid
+    out like the per-file CSVs, with the slots of the whole run as columns (Payrolls_Wide).
+    Rows are buffered and written in batches of `batch_rows`.
+    """
+
+    def __init__(self, output_path, file_format="csv", layout="long", batch_rows=50000):
+        self.batch_rows = batch_rows
+        self._buffer = []
+        if layout == "wide":
+            self.path = f"{output_path}/Payrolls_Wide.{file_format}"
+            self.table = WideTable(self.path, file_format, batch_rows)
+            self.sink = None
+        else:
+            self.path = f"{output_path}/Payrolls.{file_format}"
+            self.sink = open_sink(self.path, PAYROLL_BULK_FIELDS, file_format)
+            self.table = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        """Add the PayrollRecord of one employee. Returns the path of the bulk file."""
+        if self.table is not None:
+            self.table.write(record.fieldnames(), record.values())
+        else:
+            self._buffer.extend(record.bulk_rows())
+            if len(self._buffer) >= self.batch_rows:
+                self._flush()
+        return self.path
+
+    def _flush(self):
+        if self._buffer:
+            self.sink.write(self._buffer)
+        self._buffer = []
+
+    @instrument.timed("csv_writing")
+    def close(self):
+        if self.table is not None:
+            self.table.close()
+        else:
+            self._flush()
+            self.sink.close()
+
+
+def write_payrolls(records, output_path="./generated_csv", output_mode="per-file", bulk_format="csv"):
+    """Write the PayrollRecords in an output mode of OUTPUT_MODES. Returns the number written."""
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{output_mode}', expected one of {OUTPUT_MODES}")
+    count = 0
+    if output_mode == "per-file":
+        for record in records:
+            write_payroll_csv(record, output_path)
+            count += 1
+        return count
+    with BulkPayrollWriter(output_path, bulk_format, "wide" if output_mode == "wide" else "long") as writer:
+        for record in records:
+            writer.write(record)
+            count += 1
+    return count
 
 
 def extract_number_after_colon(s):
@@ -218,33 +325,212 @@ def parse_and_sum_keyed_financial_values(column):
     return sums
 
 
+@instrument.timed("block_detection")
+def segment_payroll_blocks(df):
+    """Number every row of a cleaned sheet with its employee block, in one pass over the sheet.
+
+    A block starts at an 'Associate ID' row and runs until the next one, rows before the
+    first employee get block 0. Returns the block id of every row, aligned with df, and a
+    frame indexed by block id (from 1) with the block's start and end row labels (inclusive),
+    its first and stop positions, so df.iloc[first:stop] is the block without a copy, and the
+    file number and rate of its Associate ID row. Positions don't depend on the row labels,
+    so blocks stay right after clean_dataframe() drops rows.
+    """
+    is_associate = df[0].str.contains('Associate ID').fillna(False).astype(bool)
+    block_ids = is_associate.cumsum()
+    first = np.flatnonzero(is_associate.to_numpy())
+    stop = np.r_[first[1:], len(df)].astype(int)
+    associate_rows = df[0][is_associate]
+    blocks = pd.DataFrame({
+        "start": df.index[first],
+        "end": df.index[stop - 1],
+        "first": first,
+        "stop": stop,
+        "file_number": associate_rows.str.extract(r'File #: (\d+)', expand=False).to_numpy(),
+        "rate": associate_rows.str.extract(r'Rate: (\d+\.\d+)', expand=False).fillna("Not Found").to_numpy(),
+    }, index=pd.RangeIndex(1, len(first) + 1, name="block"))
+    return block_ids, blocks
+
+
 def find_payroll_blocks(df):
-    # Create a boolean series where True indicates the start of a new employee block
-    new_block_starts = df[0].str.contains('Associate ID').fillna(False)
+    """(start, end) row labels of every employee block of a cleaned sheet, both inclusive."""
+    blocks = segment_payroll_blocks(df)[1]
+    return list(zip(blocks["start"], blocks["end"]))
+
+
+PAYCODE_PATTERN = r'(\b[A-Z0-9 ]+\b) (\d+\.\d+|\d+)'
+
+
+def _sequential_sums(groups, values, n_groups):
+    """Sum the values of each group strictly in order, the way `total += value` does in a loop.
+
+    One value of every group is added per step, so the work stays vectorized over the groups
+    while the totals come out exactly as in the per-block path, to the last digit.
+    """
+    sums = np.zeros(n_groups)
+    if not len(values):
+        return sums
+    order = np.argsort(groups, kind='stable')
+    groups, values = groups[order], values[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    position = np.arange(len(groups)) - np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    by_position = np.argsort(position, kind='stable')
+    steps = np.r_[0, np.cumsum(np.bincount(position))]
+    for first, last in zip(steps[:-1], steps[1:]):
+        at = by_position[first:last]
+        sums[groups[at]] += values[at]
+    return sums
 
-    # Find start indices of blocks
-    start_indices = new_block_starts[new_block_starts].index
 
-    # Generate tuples of (start, end) indices for each block
-    payroll_blocks = [(start, end - 2) for start, end in zip(start_indices, start_indices[1:].append(pd.Index([len(df)])))]
+def _sum_by_block(values, block_starts):
+    """Series.sum() of each block of a column, coerced to numbers like create_summary does."""
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+    values = np.where(np.isnan(values), 0.0, values)
+    block_ends = np.r_[block_starts[1:], len(values)]
+    lengths = block_ends - block_starts
+    sums = _sequential_sums(np.repeat(np.arange(len(block_starts)), lengths), values, len(block_starts))
+    # numpy adds 8 or more values pairwise, so longer blocks are summed the same way
+    for i in np.flatnonzero(lengths >= 8):
+        sums[i] = values[block_starts[i]:block_ends[i]].sum()
+    return sums
 
-    return payroll_blocks
 
+def _keyed_sums_by_block(blocks, keys, values):
+    """{block: {key: total}} with the keys of each block in order of first appearance."""
+    codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([blocks, keys]), sort=False)
+    totals = _sequential_sums(codes, values, len(pairs))
+    sums = defaultdict(dict)
+    for (block, key), total in zip(pairs, totals):
+        sums[block][key] = total
+    return sums
 
-def main():
-    # update these lines with the actual path and sheet name or consider dynamic input
-    file_path = '/home/mr/projects/labor-calculations-test/files/samples/quintuple-payroll.xlsx'
-    sheet_name = '3_payrolls'
 
-    payroll_extractor = PayrollDataExtractor(file_path, sheet_name)
-    payroll_extractor.clean_dataframe()
+def _strings(column):
+    return column[column.map(type) == str]
+
+
+def _parse_values_by_block(column, blocks):
+    """parse_and_sum_values for every block at once, with a single regex pass over the column."""
+    matches = _strings(column).str.extractall(PAYCODE_PATTERN)
+    if matches.empty:
+        return {}
+    rows = matches.index.get_level_values(0)
+    return _keyed_sums_by_block(blocks[rows].to_numpy(), matches[0].to_numpy(), matches[1].astype(float).to_numpy())
+
+
+def _parse_keyed_financial_values_by_block(column, blocks):
+    """parse_and_sum_keyed_financial_values for every block at once."""
+    parts = _strings(column).str.rsplit(n=1, expand=True)
+    if parts.shape[1] < 2:
+        return {}
+    parts = parts.dropna()
+    amounts = pd.to_numeric(parts[1].str.replace(',', ''), errors='coerce')
+    parts, amounts = parts[amounts.notna()], amounts[amounts.notna()]
+    return _keyed_sums_by_block(blocks[parts.index].to_numpy(), parts[0].to_numpy(), amounts.to_numpy())
+
+
+@instrument.timed("table_extraction")
+def summarize_payroll(df):
+    """Build the PayrollRecord of every employee of a cleaned sheet, in sheet order."""
+    return list(iter_payroll_records(df))
+
+
+def iter_payroll_records(df):
+    """Yield the PayrollRecord of every employee of a cleaned sheet, in sheet order.
+
+    Each row belongs to the block of the last 'Associate ID' row above it, see
+    segment_payroll_blocks(). Every column is parsed once for the whole sheet and the totals
+    come out of a groupby on the block, so no block is sliced or copied. The records
+    themselves are built as they are consumed.
+    """
+    blocks, segments = segment_payroll_blocks(df)
+    if segments.empty:
+        return
+    # Rows before the first employee are in block 0 and are left out
+    offset = segments["first"].iloc[0]
+    df, blocks = df.iloc[offset:], blocks.iloc[offset:]
+    block_starts = segments["first"].to_numpy() - offset
+
+    first_rows = df.iloc[block_starts]
+    last_rows = df.iloc[segments["stop"].to_numpy() - offset - 1]
+    total_hours = _strings(last_rows[1]).str.extract(r':\s*(\d+\.?\d*)', expand=False).astype(float)
+    total_hours = total_hours.reindex(last_rows.index)
+
+    regular_hours = _sum_by_block(df[1], block_starts)
+    regular_earnings = _sum_by_block(df[4], block_starts)
+    overtime_hours = _sum_by_block(df[2], block_starts)
+    overtime_earnings = _sum_by_block(df[5], block_starts)
+    paycode_hours = _parse_values_by_block(df[3], blocks)
+    paycode_earnings = _parse_values_by_block(df[6], blocks)
+    federal_taxes = _parse_values_by_block(df[9], blocks)
+    local_taxes = _parse_values_by_block(df[10], blocks)
+    voluntary_deductions = _parse_keyed_financial_values_by_block(df[11], blocks)
+    net_pay = _parse_keyed_financial_values_by_block(df[12], blocks)
+
+    for block, file_number, rate, gross, total_worked_hours in zip(segments.index, segments["file_number"],
+                                                                    segments["rate"], first_rows[8], total_hours):
+        summary = merge_summary(regular_hours[block - 1], regular_earnings[block - 1], overtime_hours[block - 1],
+                                overtime_earnings[block - 1], paycode_hours.get(block, {}),
+                                paycode_earnings.get(block, {}))
+        deductions = merge_deductions(federal_taxes.get(block, {}), local_taxes.get(block, {}))
+        yield build_payroll_record(file_number, rate, gross, voluntary_deductions.get(block, {}),
+                                   net_pay.get(block, {}),
+                                   None if pd.isna(total_worked_hours) else total_worked_hours,
+                                   summary, deductions)
+
+
+def iter_payrolls(file_path, sheet_name="3_payrolls", use_cache=False, reader="auto"):
+    """Lazily yield the PayrollRecord of every employee of a payroll sheet, without writing any file.
+
+    Unlike PayrollDataExtractor, a file that can't be read raises instead of exiting.
+    """
+    df = read_excel_cached(file_path, sheet_name, use_cache=use_cache, reader=reader)
+    yield from PayrollDataExtractor(file_path, sheet_name, df=df).iter_payrolls()
 
-    payroll_blocks = find_payroll_blocks(payroll_extractor.df)
-    print(payroll_blocks)
 
-    for index, (start, end) in enumerate(payroll_blocks):
-        extracted_employee_data = payroll_extractor.extract_employee_data(start, end)
-        print(extracted_employee_data)  # Display the first few rows
+def main():
+    parser = argparse.ArgumentParser(description="Extract the payroll summary of every employee from an Excel file.")
+    # update these defaults with the actual path and sheet name
+    parser.add_argument("file_path", nargs='?',
+                        default='/home/mr/projects/labor-calculations-test/files/samples/quintuple-payroll.xlsx',
+                        help="Path to the Excel file")
+    parser.add_argument("sheet_name", nargs='?', default='3_payrolls', help="Name of the payroll sheet")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Summarize all employees in one pass over the sheet instead of block by block")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="per-file",
+                        help="Write a CSV per employee, or a single file with a row per summary, deduction and tax "
+                             "(bulk) or per employee with the columns of the whole run (wide); both are vectorized")
+    parser.add_argument("--bulk-format", choices=BULK_FORMATS, default="csv",
+                        help="File format of the bulk and wide output modes")
+    parser.add_argument("--reader", choices=READERS, default="auto",
+                        help="Backend reading the sheet, calamine when installed and openpyxl otherwise")
+    parser.add_argument("--no-cache", action="store_true", help="Parse the workbook without the sheet cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Empty the sheet cache before running")
+    add_instrumentation_arguments(parser)
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        clear_cache()
+
+    with instrumented_run(args.report, args.profile, args.report_memory):
+        payroll_extractor = PayrollDataExtractor(args.file_path, args.sheet_name, use_cache=not args.no_cache,
+                                                 reader=args.reader)
+        payroll_extractor.clean_dataframe()
+
+        if args.vectorized or args.output_mode != "per-file":
+            rows = summarize_payroll(payroll_extractor.df)
+            instrument.count("blocks", len(rows))
+            write_payrolls(rows, './generated_csv', args.output_mode, args.bulk_format)
+            return
+
+        payroll_blocks = payroll_extractor.find_blocks()
+        print(payroll_blocks)
+
+        for index, (start, end) in enumerate(payroll_blocks):
+            extracted_employee_data = payroll_extractor.extract_employee_data(start, end)
+            instrument.count("blocks")
+            instrument.count("block_rows", len(extracted_employee_data))
+            print(extracted_employee_data)  # Display the first few rows
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+import argparse, sys, os, csv, glob, gzip, re
+from itertools import groupby
+
+RECONCILE_PAYCODES = ("REG", "OT", "TOTAL")
+DISCREPANCY_FIELDS = ["companyCode", "fileNumber", "dateFrom", "paycode", "timecardHours", "payrollHours", "difference",
+                      "status", "timecardLabel", "payrollLabel"]
+EMPLOYEE_PATTERN = re.compile(r'^\s*(.*?)(\d+)\s*$')
+
+
+def employee_key(employee, date_from, ignore_company=False):
+    """(company code, 6-digit file number, pay period start) of an employee id like EP1000123.
+
+    Timecards build the id from the Company Code and File Number, the payroll from its File #,
+    so both sides end up with the same key after normalization.
+    """
+    match = EMPLOYEE_PATTERN.match(str(employee))
+    if match is None:
+        company, file_number = str(employee).strip(), ""
+    else:
+        company, file_number = match.group(1), match.group(2).zfill(6)[-6:]
+        # Ids shorter than company + 6 digits have the company digits glued to the number
+        if len(match.group(2)) > 6:
+            company += match.group(2)[:-6]
+    return ("" if ignore_company else company.strip().upper(), file_number, str(date_from).strip())
+
+
+def _hours(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def summary_hours(row):
+    """{paycode: hours} of a timecard header or payroll CSV row, with the row's totalHs as TOTAL."""
+    hours = {}
+    i = 0
+    while f"summary[{i}].paycode" in row:
+        paycode, value = row[f"summary[{i}].paycode"], _hours(row.get(f"summary[{i}].hours"))
+        if paycode and value is not None:
+            hours[paycode] = hours.get(paycode, 0) + value
+        i += 1
+    total = _hours(row.get("totalHs"))
+    if total is not None:
+        hours["TOTAL"] = total
+    return hours
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', newline='')
+    return open(path, newline='')
+
+
+def _read_csv_rows(paths):
+    for path in paths:
+        with _open_text(path) as f:
+            yield from csv.DictReader(f)
+
+
+def _find_file(path, names):
+    """`path` itself when it is a file, else the first of the names found in the `path` folder."""
+    if os.path.isfile(path):
+        return path
+    for name in names:
+        if os.path.isfile(os.path.join(path, name)):
+            return os.path.join(path, name)
+    return None
+
+
+def _is_wide(path):
+    return os.path.basename(path).split('.')[0].endswith("_Wide")
+
+
+def read_timecard_records(path):
+    """Yield (employee, dateFrom, label, {paycode: hours}) for every timecard written to `path`.
+
+    `path` is the output folder (per-file headers/ CSVs, the bulk Timecard_Headers.csv[.gz]
+    or the wide Timecard_Headers_Wide.csv[.gz]) or one of those files. Files are read one row
+    at a time.
+    """
+    bulk = _find_file(path, ("Timecard_Headers.csv", "Timecard_Headers.csv.gz", "Timecard_Headers_Wide.csv",
+                             "Timecard_Headers_Wide.csv.gz"))
+    if bulk is None or _is_wide(bulk):
+        # Wide rows are laid out like the per-file header CSVs
+        paths = [bulk] if bulk else sorted(glob.glob(os.path.join(path, "headers", "*.csv")))
+        for row in _read_csv_rows(paths):
+            yield row["employee"], row["dateFrom"], row["timecardLabel"], summary_hours(row)
+        return
+
+    # Bulk headers have a row per summary paycode, the rows of a timecard are next to each other
+    for label, rows in groupby(_read_csv_rows([bulk]), key=lambda row: row["timecardLabel"]):
+        hours = {}
+        for row in rows:
+            value = _hours(row["hours"])
+            if row["paycode"] and value is not None:
+                hours[row["paycode"]] = hours.get(row["paycode"], 0) + value
+        total = _hours(row["totalHs"])
+        if total is not None:
+            hours["TOTAL"] = total
+        yield row["employee"], row["dateFrom"], label, hours
+
+
+def read_payroll_records(path):
+    """Yield (employee, dateFrom, label, {paycode: hours}) for every payroll written to `path`.
+
+    `path` is the output folder (per-file payrolls/ CSVs, the bulk Payrolls.csv[.gz] or the
+    wide Payrolls_Wide.csv[.gz]), its payrolls/ folder or one of the bulk files.
+    """
+    bulk = _find_file(path, ("Payrolls.csv", "Payrolls.csv.gz", "Payrolls_Wide.csv", "Payrolls_Wide.csv.gz"))
+    if bulk is None or _is_wide(bulk):
+        folder = os.path.join(path, "payrolls") if os.path.isdir(os.path.join(path, "payrolls")) else path
+        paths = [bulk] if bulk else sorted(glob.glob(os.path.join(folder, "*.csv")))
+        for row in _read_csv_rows(paths):
+            yield row["employee"], row["dateFrom"], row["payrollLabel"], summary_hours(row)
+        return
+
+    # Bulk payrolls have a row per summary paycode, deduction and tax, next to each other
+    for label, rows in groupby(_read_csv_rows([bulk]), key=lambda row: row["payrollLabel"]):
+        hours = {}
+        for row in rows:
+            value = _hours(row["hours"])
+            if row["section"] == "summary" and row["code"] and value is not None:
+                hours[row["code"]] = hours.get(row["code"], 0) + value
+        total = _hours(row["totalHs"])
+        if total is not None:
+            hours["TOTAL"] = total
+        yield row["employee"], row["dateFrom"], label, hours
+
+
+def build_index(records, ignore_company=False):
+    """Hash index of the records by employee key, summing the hours of a key seen more than once."""
+    index = {}
+    for employee, date_from, label, hours in records:
+        key = employee_key(employee, date_from, ignore_company)
+        entry = index.get(key)
+        if entry is None:
+            index[key] = [label, dict(hours)]
+            continue
+        for paycode, value in hours.items():
+            entry[1][paycode] = entry[1].get(paycode, 0) + value
+    return index
+
+
+def _compare(key, timecard, payroll, paycodes, tolerance, include_matches, status=None):
+    timecard_label, timecard_hours = timecard if timecard else ("", {})
+    payroll_label, payroll_hours = payroll if payroll else ("", {})
+    if status is None and timecard is None:
+        status = "missing_timecard"
+    elif status is None and payroll is None:
+        status = "missing_payroll"
+    codes = paycodes or sorted(set(timecard_hours) | set(payroll_hours))
+    for paycode in codes:
+        worked, paid = timecard_hours.get(paycode), payroll_hours.get(paycode)
+        if worked is None and paid is None:
+            continue
+        difference = (paid or 0) - (worked or 0)
+        row_status = status or ("mismatch" if abs(difference) > tolerance else "match")
+        if row_status == "match" and not include_matches:
+            continue
+        yield {"companyCode": key[0], "fileNumber": key[1], "dateFrom": key[2], "paycode": paycode,
+               "timecardHours": "" if worked is None else worked, "payrollHours": "" if paid is None else paid,
+               "difference": round(difference, 6), "status": row_status,
+               "timecardLabel": timecard_label, "payrollLabel": payroll_label}
+
+
+def reconcile(timecard_records, payroll_records, paycodes=RECONCILE_PAYCODES, tolerance=0.01, ignore_company=False,
+              include_matches=False):
+    """Join the timecard and payroll hours on the employee key and yield a row per paycode discrepancy.
+
+    Only the timecards are indexed; the payroll records are streamed against the index in a
+    single pass, so both sides are read once and the run is linear in the number of records.
+    Discrepancy statuses are "mismatch", "missing_payroll" (a timecard without payroll),
+    "missing_timecard", "duplicate_payroll" and, with include_matches, "match". With
+    paycodes=None every paycode found on either side is compared.
+    """
+    index = build_index(timecard_records, ignore_company)
+    seen = set()
+    for employee, date_from, label, hours in payroll_records:
+        key = employee_key(employee, date_from, ignore_company)
+        if key in seen:
+            # Its timecard was already compared with the first payroll of the employee and period
+            yield from _compare(key, None, (label, hours), paycodes, tolerance, include_matches, "duplicate_payroll")
+            continue
+        seen.add(key)
+        yield from _compare(key, index.pop(key, None), (label, hours), paycodes, tolerance, include_matches)
+    # Whatever is left in the index had no payroll
+    for key, timecard in index.items():
+        yield from _compare(key, timecard, None, paycodes, tolerance, include_matches)
+
+
+def write_discrepancies(rows, output_file):
+    """Write the reconciliation rows to a CSV as they come. Returns the number of rows written."""
+    count = 0
+    with open(output_file, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=DISCREPANCY_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the timecard hours with the payroll hours of every employee.")
+    parser.add_argument("--timecards", default="./generated_csv",
+                        help="Output folder of the timecard extraction, or its bulk or wide headers file")
+    parser.add_argument("--payrolls", default="./generated_csv",
+                        help="Output folder of the payroll extraction, or its bulk or wide file")
+    parser.add_argument("--output", default="./generated_csv/Reconciliation.csv", help="CSV of the discrepancies")
+    parser.add_argument("--paycodes", nargs='+', default=list(RECONCILE_PAYCODES),
+                        help="Paycodes to compare (TOTAL is totalHs), or 'all'")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Hours of difference still taken as a match")
+    parser.add_argument("--ignore-company", action="store_true",
+                        help="Match employees on the file number and pay period only")
+    parser.add_argument("--include-matches", action="store_true", help="Also write the paycodes that match")
+    args = parser.parse_args()
+
+    for path in (args.timecards, args.payrolls):
+        if not os.path.exists(path):
+            print(f"File Error: '{path}' does not exist.")
+            sys.exit(1)
+
+    paycodes = None if args.paycodes == ["all"] else args.paycodes
+    rows = reconcile(read_timecard_records(args.timecards), read_payroll_records(args.payrolls), paycodes,
+                     args.tolerance, args.ignore_company, args.include_matches)
+    count = write_discrepancies(rows, args.output)
+    print(f"Wrote {count} discrepancies to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
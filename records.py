@@ -0,0 +1,243 @@
+import numpy as np
+from itertools import repeat
+
+DETAILS_FIELDS = ["timecard", "datetimeIn", "datetimeOut", "workedHours", "dailyTotals", "payCode", "outType",
+                  "workedDepID", "notes"]
+PAYROLL_BULK_FIELDS = ["payrollLabel", "company", "employee", "dateFrom", "rate", "gross", "totalHs", "memos",
+                       "section", "code", "type", "hours", "amount"]
+
+
+class TimecardHeader:
+    """Header row of one timecard. The summary is a tuple of (paycode, hours) pairs."""
+
+    __slots__ = ("company_code", "employee", "date_from", "date_to", "supervisor", "total_hours", "label", "summary")
+
+    def __init__(self, company_code, employee, date_from, date_to, supervisor, total_hours, label, summary):
+        self.company_code = company_code
+        self.employee = employee
+        self.date_from = date_from
+        self.date_to = date_to
+        self.supervisor = supervisor
+        self.total_hours = total_hours
+        self.label = label
+        self.summary = summary
+
+    def fieldnames(self):
+        fields = ["company.companyCode", "employee", "dateFrom", "dateTo", "supervisor", "totalHs", "timecardLabel"]
+        for i in range(len(self.summary)):
+            fields += [f"summary[{i}].paycode", f"summary[{i}].hours"]
+        return fields
+
+    def values(self):
+        values = [self.company_code, self.employee, self.date_from, self.date_to, self.supervisor, self.total_hours,
+                  self.label]
+        for paycode, hours in self.summary:
+            values += [paycode, hours]
+        return values
+
+
+class NumberColumn:
+    """float64 values plus which of them were integers, so they are written back exactly as read."""
+
+    __slots__ = ("values", "is_int")
+
+    def __init__(self, values, is_int):
+        self.values = values
+        self.is_int = is_int
+
+    @classmethod
+    def from_objects(cls, values):
+        """NumberColumn of the values, or the values as an object array when they are not all numbers."""
+        values = np.asarray(values, dtype=object)
+        is_int = np.fromiter((isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+                              for value in values), dtype=bool, count=len(values))
+        is_float = np.fromiter((isinstance(value, (float, np.floating)) for value in values), dtype=bool,
+                               count=len(values))
+        if not (is_int | is_float).all() or any(abs(value) > 2 ** 53 for value in values[is_int]):
+            return values
+        return cls(values.astype(np.float64), is_int)
+
+    def __len__(self):
+        return len(self.values)
+
+    def tolist(self):
+        return [int(value) if is_int else value for value, is_int in zip(self.values.tolist(), self.is_int.tolist())]
+
+
+class Vocabulary:
+    """The distinct values of a column over the whole run, so each row only stores an int32 code.
+
+    Values are told apart by type too, so 1000 isn't written back as 1000.0, and missing ones
+    are -1. Codes only mean something in the process that made them, so records are pickled
+    with their values (see TimecardDetails).
+    """
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, values):
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None or value != value:
+                codes[i] = -1
+                continue
+            code = self._codes.get((type(value), value))
+            if code is None:
+                code = self._codes[(type(value), value)] = len(self.values)
+                self.values.append(value)
+            codes[i] = code
+        return codes
+
+    def decode(self, codes):
+        values = self.values
+        return [values[code] if code >= 0 else np.nan for code in codes.tolist()]
+
+
+PAY_CODES, OUT_TYPES, DEPARTMENTS = Vocabulary(), Vocabulary(), Vocabulary()
+
+
+def _format_minutes(values):
+    return [value.replace('T', ' ') for value in np.datetime_as_string(values, unit='m').tolist()]
+
+
+class TimecardDetails:
+    """Details rows of one timecard as typed columns.
+
+    Punches are datetime64[m], hours float64 (see NumberColumn), and paycodes, out types and
+    departments int32 codes of the run's PAY_CODES, OUT_TYPES and DEPARTMENTS. The timecard
+    label is stored once instead of once per row. The constructor takes the plain values.
+    """
+
+    __slots__ = ("label", "datetime_in", "datetime_out", "worked_hours", "daily_totals", "pay_code", "out_type",
+                 "worked_dep", "notes")
+
+    def __init__(self, label, datetime_in, datetime_out, worked_hours, daily_totals, pay_code, out_type, worked_dep,
+                 notes):
+        self.label = label
+        self.datetime_in = np.asarray(datetime_in, dtype='datetime64[m]')
+        self.datetime_out = np.asarray(datetime_out, dtype='datetime64[m]')
+        self.worked_hours = worked_hours
+        self.daily_totals = daily_totals
+        self.pay_code = PAY_CODES.encode(pay_code)
+        self.out_type = OUT_TYPES.encode(out_type)
+        self.worked_dep = DEPARTMENTS.encode(worked_dep)
+        self.notes = notes
+
+    def __getstate__(self):
+        return (self.label, self.datetime_in, self.datetime_out, self.worked_hours, self.daily_totals,
+                PAY_CODES.decode(self.pay_code), OUT_TYPES.decode(self.out_type),
+                DEPARTMENTS.decode(self.worked_dep), self.notes)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __len__(self):
+        return len(self.notes)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def _value_columns(self):
+        return [_format_minutes(self.datetime_in), _format_minutes(self.datetime_out), self.worked_hours.tolist(),
+                self.daily_totals.tolist(), PAY_CODES.decode(self.pay_code), OUT_TYPES.decode(self.out_type),
+                DEPARTMENTS.decode(self.worked_dep), list(self.notes)]
+
+    def rows(self):
+        """Iterate the rows as tuples for csv.writer, without building a dict per row."""
+        return zip(repeat(self.label, len(self)), *self._value_columns())
+
+
+class PayrollRecord:
+    """Payroll row of one employee.
+
+    voluntary_deductions holds (detail, amount) pairs, net_pay the last (detail, amount) pair
+    or None, summary (paycode, hours, total) triples and deductions (code, type, rate) triples.
+    """
+
+    __slots__ = ("company", "employee", "date_from", "rate", "gross", "voluntary_deductions", "net_pay",
+                 "total_hours", "summary", "deductions", "memos", "label")
+
+    def __init__(self, company, employee, date_from, rate, gross, voluntary_deductions, net_pay, total_hours, summary,
+                 deductions, memos, label):
+        self.company = company
+        self.employee = employee
+        self.date_from = date_from
+        self.rate = rate
+        self.gross = gross
+        self.voluntary_deductions = voluntary_deductions
+        self.net_pay = net_pay
+        self.total_hours = total_hours
+        self.summary = summary
+        self.deductions = deductions
+        self.memos = memos
+        self.label = label
+
+    def fieldnames(self):
+        fields = ["company", "employee", "dateFrom", "rate", "gross"]
+        for i in range(len(self.voluntary_deductions)):
+            fields += [f"voluntaryDeductions[{i}].detail", f"voluntaryDeductions[{i}].amount"]
+        if self.net_pay is not None:
+            fields += ["netPay.detail", "netPay.amount"]
+        fields.append("totalHs")
+        for i in range(len(self.summary)):
+            fields += [f"summary[{i}].paycode", f"summary[{i}].hours", f"summary[{i}].total"]
+        for i in range(len(self.deductions)):
+            fields += [f"deductions[{i}].code", f"deductions[{i}].type", f"deductions[{i}].rate"]
+        return fields + ["memos", "payrollLabel"]
+
+    def values(self):
+        values = [self.company, self.employee, self.date_from, self.rate, self.gross]
+        for pair in self.voluntary_deductions:
+            values += pair
+        if self.net_pay is not None:
+            values += self.net_pay
+        values.append(self.total_hours)
+        for triple in self.summary:
+            values += triple
+        for triple in self.deductions:
+            values += triple
+        return values + [self.memos, self.label]
+
+    def bulk_rows(self):
+        """Rows of PAYROLL_BULK_FIELDS: one per voluntary deduction, net pay, summary paycode and tax.
+
+        The section column tells them apart; an employee without any still gets one row.
+        """
+        fixed = [self.label, self.company, self.employee, self.date_from, self.rate, self.gross, self.total_hours,
+                 self.memos]
+        rows = [fixed + ["voluntaryDeductions", detail, "", "", amount]
+                for detail, amount in self.voluntary_deductions]
+        if self.net_pay is not None:
+            rows.append(fixed + ["netPay", self.net_pay[0], "", "", self.net_pay[1]])
+        rows += [fixed + ["summary", paycode, "", hours, total] for paycode, hours, total in self.summary]
+        rows += [fixed + ["deductions", code, tax_type, "", rate] for code, tax_type, rate in self.deductions]
+        return rows or [fixed + ["", "", "", "", ""]]
+
+
+class Timecard:
+    """One parsed timecard block.
+
+    header is a TimecardHeader and details a TimecardDetails; totals are the (label, hours)
+    pairs of the block's Total rows, additional_info the Company Code, Date Range and File
+    Number. index, start and end locate the block in the sheet.
+    """
+
+    __slots__ = ("index", "start", "end", "header", "details", "totals", "additional_info")
+
+    def __init__(self, index, start, end, header, details, totals, additional_info):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.header = header
+        self.details = details
+        self.totals = totals
+        self.additional_info = additional_info
+
+    @property
+    def summary(self):
+        """The (EQUIV, hours) pairs of the summary table, see TimecardHeader."""
+        return self.header.summary
@@ -0,0 +1,85 @@
+import pandas as pd
+import hashlib, os, tempfile
+from sheet_reader import read_sheet
+
+CACHE_DIR = os.environ.get("LABOR_CALC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "labor-calculations"))
+CACHE_MAX_BYTES = int(os.environ.get("LABOR_CALC_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """SHA-256 of the file content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(file_path, sheet_name, cache_dir=CACHE_DIR):
+    sheet_key = hashlib.sha256(repr(sheet_name).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{file_digest(file_path)}-{sheet_key}.pkl")
+
+
+def read_excel_cached(file_path, sheet_name, use_cache=True, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES,
+                      reader="auto"):
+    """pd.read_excel(file_path, sheet_name=sheet_name, header=None), cached by workbook content and sheet.
+
+    The raw sheet is kept as a pickle, which round-trips the mixed object columns exactly
+    and loads much faster than parsing the XLSX again. A cached entry is only reused when
+    the workbook bytes are the same, so a re-sent or edited export is parsed again.
+    The sheet is parsed with sheet_reader.read_sheet(); every reader gives the same grid,
+    so entries are shared between readers.
+    """
+    if not use_cache:
+        return read_sheet(file_path, sheet_name, reader)
+
+    path = cache_path(file_path, sheet_name, cache_dir)
+    try:
+        df = pd.read_pickle(path)
+        os.utime(path)  # Mark as recently used
+        return df
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        # A truncated or incompatible entry, parse the workbook again
+        print(f"Ignoring unreadable sheet cache entry {path}: {e}")
+
+    df = read_sheet(file_path, sheet_name, reader)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so a concurrent reader never sees half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pd.to_pickle(df, f)
+        os.replace(tmp_path, path)
+        evict(cache_dir, max_bytes)
+    except OSError as e:
+        print(f"Could not write the sheet cache: {e}")
+    return df
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """Remove the least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".pkl"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Remove every cached sheet."""
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith((".pkl", ".tmp")):
+            os.remove(entry.path)
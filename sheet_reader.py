@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+import csv, os, re
+from datetime import date, datetime
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # Optional, the openpyxl reader is used instead
+    CalamineWorkbook = None
+
+READERS = ("auto", "openpyxl", "calamine", "csv", "pandas")
+TEXT_EXTENSIONS = (".csv", ".tsv")
+EXCEL_ERRORS = frozenset(("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA"))
+NUMBER_PATTERN = re.compile(r'-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?')
+# Dates as a spreadsheet writes them to CSV: month first like the report's own Date Range, with
+# an optional time ("10/2/2023", "10/2/2023 8:00", "10/2/2023 8:00:00 AM")
+EXPORT_DATE_PATTERN = re.compile(r'(\d{1,2})/(\d{1,2})/(\d{4})(?: (\d{1,2}):(\d{2})(?::(\d{2}))?(?: ?([AP]M))?)?',
+                                 re.IGNORECASE)
+
+
+def convert_value(value):
+    """Convert a cell value the same way pd.read_excel does with openpyxl cells.
+
+    Only the bare values are read, without the cell data types, so the Excel error strings
+    are taken as errors. Dates are returned as datetimes, like openpyxl does for every date cell.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if value != value or value in (float('inf'), float('-inf')):
+            return float(value)
+        integer = int(value)
+        if integer == value:
+            return integer
+        return float(value)
+    if isinstance(value, str) and value in EXCEL_ERRORS:
+        return np.nan
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def convert_text(value):
+    """Convert a CSV/TSV field to the value the workbook cell would have had.
+
+    Numbers, ISO dates (as written by pandas) and month-first m/d/yyyy dates (as written by a
+    spreadsheet's CSV export, see EXPORT_DATE_PATTERN) are parsed, everything else stays text.
+    Day-first exports are not told apart and stay text only when the day is over 12, so
+    convert those to ISO dates upstream.
+    """
+    if NUMBER_PATTERN.fullmatch(value):
+        return convert_value(float(value) if any(c in value for c in '.eE') else int(value))
+    if DATE_PATTERN.fullmatch(value):
+        return datetime.fromisoformat(value)
+    match = EXPORT_DATE_PATTERN.fullmatch(value)
+    if match:
+        month, day, year, hour, minute, second, meridiem = match.groups()
+        hour = int(hour or 0)
+        if meridiem:
+            hour = hour % 12 + (12 if meridiem.upper() == "PM" else 0)
+        try:
+            return datetime(int(year), int(month), int(day), hour, int(minute or 0), int(second or 0))
+        except ValueError:
+            # Not a date after all, like 13/1/2023
+            pass
+    return convert_value(value)
+
+
+def resolve_reader(file_path, reader="auto", streaming=False):
+    """The reader used for the file: 'auto' picks csv for .csv/.tsv files, then calamine
+    when python-calamine is installed and openpyxl otherwise. This is a fixed order, the
+    fastest in benchmark.py; the benchmark reports the fastest reader on your own workbooks.
+
+    When streaming, 'auto' and 'pandas' fall back to openpyxl, the only workbook reader that
+    doesn't load the whole sheet at once.
+    """
+    if reader not in READERS:
+        raise ValueError(f"Unknown reader '{reader}', expected one of {', '.join(READERS)}")
+    if reader == "calamine" and CalamineWorkbook is None:
+        raise ValueError("The calamine reader needs the python-calamine package")
+    if reader == "auto" and str(file_path).lower().endswith(TEXT_EXTENSIONS):
+        return "csv"
+    if streaming and reader in ("auto", "pandas"):
+        return "openpyxl"
+    if reader == "auto":
+        return "calamine" if CalamineWorkbook is not None else "openpyxl"
+    return reader
+
+
+def available_readers():
+    """Workbook readers that can be used here, the optional ones only when installed."""
+    return ["pandas", "openpyxl"] + (["calamine"] if CalamineWorkbook is not None else [])
+
+
+def _trimmed(rows):
+    for values in rows:
+        while values and values[-1] == "":
+            values.pop()
+        yield values
+
+
+def _open_workbook(file_path, reader):
+    if reader == "calamine":
+        return CalamineWorkbook.from_path(file_path)
+    # Values only: no cell objects are built and no styles are looked at
+    return load_workbook(file_path, read_only=True, data_only=True, keep_links=False)
+
+
+def _workbook_sheet_names(workbook, reader):
+    return list(workbook.sheet_names) if reader == "calamine" else workbook.sheetnames
+
+
+def _workbook_rows(workbook, sheet_name, reader):
+    """Converted rows of one sheet of a workbook opened with _open_workbook."""
+    if reader == "calamine":
+        # calamine holds the whole sheet in memory anyway; skip_empty_area=False keeps the
+        # grid anchored at A1 like openpyxl
+        rows = workbook.get_sheet_by_name(sheet_name).to_python(skip_empty_area=False)
+    else:
+        sheet = workbook[sheet_name]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+    for row in rows:
+        yield [convert_value(value) for value in row]
+
+
+def _iter_workbook_rows(file_path, sheet_name, reader):
+    workbook = _open_workbook(file_path, reader)
+    try:
+        yield from _workbook_rows(workbook, sheet_name, reader)
+    finally:
+        workbook.close()
+
+
+def _iter_text_rows(file_path):
+    delimiter = '\t' if file_path.lower().endswith(".tsv") else ','
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f, delimiter=delimiter):
+            yield [convert_text(value) for value in row]
+
+
+def sheet_names(file_path, reader="auto"):
+    """Names of the sheets of a workbook. A CSV/TSV file has one sheet, named after the file."""
+    reader = resolve_reader(file_path, reader)
+    if reader == "csv":
+        return [os.path.splitext(os.path.basename(file_path))[0]]
+    workbook = _open_workbook(file_path, reader)
+    try:
+        return _workbook_sheet_names(workbook, reader)
+    finally:
+        workbook.close()
+
+
+def iter_sheet_rows(file_path, sheet_name, reader="auto"):
+    """Yield the converted values of every row of a sheet, one row at a time.
+
+    The workbook is opened read-only, so only the row being parsed is kept in memory.
+    Trailing empty cells are trimmed like pd.read_excel does. The sheet name is ignored for
+    CSV/TSV files.
+    """
+    reader = resolve_reader(file_path, reader, streaming=True)
+    if reader == "csv":
+        rows = _iter_text_rows(file_path)
+    else:
+        rows = _iter_workbook_rows(file_path, sheet_name, reader)
+    yield from _trimmed(rows)
+
+
+def read_sheet(file_path, sheet_name, reader="auto"):
+    """pd.read_excel(file_path, sheet_name=sheet_name, header=None) through the chosen reader.
+
+    Every reader returns the same raw grid: the rows are trimmed and padded and go through
+    TextParser like read_excel does them, so the columns get the same dtypes. The 'pandas'
+    reader is pd.read_excel itself. A sheet_name of None reads every sheet into a dict, opening
+    the workbook once.
+    """
+    reader = resolve_reader(file_path, reader)
+    if reader == "pandas":
+        return pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+    if sheet_name is not None:
+        return _rows_to_grid(iter_sheet_rows(file_path, sheet_name, reader))
+    if reader == "csv":
+        name, = sheet_names(file_path, reader)
+        return {name: _rows_to_grid(iter_sheet_rows(file_path, name, reader))}
+    workbook = _open_workbook(file_path, reader)
+    try:
+        return {name: _rows_to_grid(_trimmed(_workbook_rows(workbook, name, reader)))
+                for name in _workbook_sheet_names(workbook, reader)}
+    finally:
+        workbook.close()
+
+
+def _rows_to_grid(rows):
+    rows = list(rows)
+    # Trailing empty rows are dropped and the others padded to the widest row
+    while rows and not rows[-1]:
+        rows.pop()
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(row) for row in rows)
+    padded = [row + [""] * (width - len(row)) for row in rows]
+    return TextParser(padded, header=None, skip_blank_lines=False).read()
+
+
+def rows_to_frame(rows, index, width):
+    """Build a header-less DataFrame from converted rows, padding them to `width` columns.
+
+    Values go through the same TextParser as pd.read_excel, so empty cells and NA strings
+    end up as NaN, but no column is cast: every column keeps object dtype like the mixed
+    columns of a full sheet.
+    """
+    padded = [row + [""] * (width - len(row)) for row in rows]
+    df = TextParser(padded, header=None, dtype=object).read()
+    df.index = index
+    return df
@@ -0,0 +1,139 @@
+import argparse, os, random
+from datetime import datetime, timedelta
+from openpyxl import Workbook
+
+TIMECARD_WIDTH = 34
+PAYROLL_WIDTH = 13
+PERIOD_START = datetime(2023, 10, 2)
+PERIOD_DAYS = 14
+
+PAYCODES = ['Regular', 'Overtime', 'Doubletime', '6th Consecutive Day Overtime', 'Paid Time Off', 'Sick', 'Vacation',
+            'Paid Meal Award', 'PAID UNION LUNCH', 'Graveyard Shift $0.85', 'Graveyard Shift $0.40', 'Unknown Code']
+OTHER_HOURS = ['SCK', 'VAC', 'PTO', 'HOL']
+FEDERAL_TAXES = ['FIT', 'SS', 'MED']
+LOCAL_TAXES = ['CA', 'SDI']
+VOLUNTARY_DEDUCTIONS = ['Medical\nInsurance', 'Dental', '401K']
+
+
+def _row(width, cells):
+    row = [None] * width
+    for col, value in cells.items():
+        row[col] = value
+    return row
+
+
+def timecard_rows(employees, days=10, paycodes=3, seed=0, noise=True):
+    """Yield the rows of a "Timecard Detail Report with Signature" sheet, one block per employee.
+
+    Each block has up to `paycodes` summary paycodes and `days` worked days of two punches.
+    With noise, some details rows are notes or unparseable punches, some days have no paycode,
+    and every 97th block is cut short, like the real exports.
+    """
+    rnd = random.Random(seed)
+    row = lambda **cells: _row(TIMECARD_WIDTH, {int(k[1:]): v for k, v in cells.items()})
+    period = f"{PERIOD_START:%m/%d/%Y} - {PERIOD_START + timedelta(days=PERIOD_DAYS - 1):%m/%d/%Y}"
+
+    yield row(c0="Timecard Detail Report")
+    for e in range(employees):
+        if noise and e % 97 == 96:
+            yield row(c0="Timecard Detail Report with Signature:", c20=f"Prepared On: {PERIOD_START:%m/%d/%Y}")
+            continue
+        yield row(c0="Timecard Detail Report with Signature:")
+        yield row(c0="Company Code: EP1", c5=f"Date Range: {period}", c11=f"File Number: {100 + e}")
+        yield row()
+        yield row(c0="Pay Code", c13="Hours")
+        total = 0
+        for paycode in rnd.sample(PAYCODES, rnd.randint(1, min(paycodes, len(PAYCODES)))):
+            hours = rnd.choice([8, 8.5, 12.25, 40, 0.1])
+            total += hours
+            yield row(c0=paycode, c13=hours)
+        yield row(c0="Total", c13=total)
+        yield row(c0="Timecard Details")
+        yield row(c0="Day", c1="Date In", c5="Time", c11="Hours", c15="Day Totals", c16="Pay Code", c21="Out Type",
+                  c31="Dept")
+        worked = 0
+        for d in sorted(rnd.sample(range(PERIOD_DAYS), min(days, PERIOD_DAYS))):
+            day = PERIOD_START + timedelta(days=d)
+            if noise and rnd.random() < 0.2:
+                yield row(c0=f"Note {e}-{d}")
+            if noise and rnd.random() < 0.1:
+                yield row(c0="X", c1=day, c5="bad stamp", c11=1)
+            end = rnd.choice(["05:15 PM", "07:00 PM", "11:30 PM"])
+            hours = {"05:15 PM": 4.75, "07:00 PM": 6.5, "11:30 PM": 11}[end]
+            yield row(c0=f"{day:%a}", c1=day, c5="8:00 AM - 12:00 PM", c11=4, c16="REG", c21="Lunch", c31=1000 + e)
+            yield row(c0=f"{day:%a}", c1=day, c5=f"12:30 PM - {end}", c11=hours, c15=4 + hours,
+                      c16=rnd.choice(["REG", None]) if noise else "REG", c31=1000 + e)
+            worked += 4 + hours
+        yield row(c0="Total", c11=worked)
+        yield row(c0=f"Prepared On: {PERIOD_START + timedelta(days=PERIOD_DAYS):%m/%d/%Y}")
+        yield row()
+
+
+def payroll_rows(employees, lines=3, seed=0):
+    """Yield the rows of a payroll register sheet: an 'Associate ID' row, up to `lines` earning
+    lines and a 'Total Hours' row per employee."""
+    rnd = random.Random(seed)
+    row = lambda **cells: _row(PAYROLL_WIDTH, {int(k[1:]): v for k, v in cells.items()})
+
+    yield row(c0="Payroll Register", c1="Reg Hours", c2="OT Hours", c3="Other Hours", c4="Reg Earn", c5="OT Earn",
+              c6="Other Earn", c8="Gross", c9="Federal", c10="Local", c11="Voluntary", c12="Net Pay")
+    for e in range(employees):
+        yield row(c0=f"Associate ID: A{e:06d} File #: {200 + e:06d} Rate: {rnd.choice(['25.0000', '18.5000'])}",
+                  c8=round(rnd.uniform(500, 3000), 2))
+        for _ in range(rnd.randint(1, lines)):
+            other = rnd.sample(OTHER_HOURS, 2)
+            yield row(c1=rnd.choice([40, 8.25]), c2=rnd.choice([None, 2.5]),
+                      c3=f"{other[0]} {rnd.choice(['8.00', '4'])} {other[1]} 4",
+                      c4=round(rnd.uniform(100, 900), 2), c5=rnd.choice([None, 93.75]),
+                      c6=f"{other[0]} 200.00 {other[1]} 100.50",
+                      c9=" ".join(f"{tax} {rnd.uniform(5, 150):.2f}" for tax in rnd.sample(FEDERAL_TAXES, 2)),
+                      c10=" ".join(f"{tax} {rnd.uniform(1, 30):.2f}" for tax in rnd.sample(LOCAL_TAXES, 2)),
+                      c11=f"{rnd.choice(VOLUNTARY_DEDUCTIONS)} {rnd.uniform(10, 1500):,.2f}",
+                      c12=rnd.choice(["Checking 1,234.56", "Savings 10.00"]))
+        yield row(c1=f"Total Hours: {rnd.choice([80, 72.5])}")
+
+
+def write_workbook(path, sheet_name, rows):
+    """Write the rows to a one-sheet workbook with openpyxl's write-only mode. Returns the row count."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_timecards_workbook(path, employees, days=10, paycodes=3, seed=0, noise=True, sheet_name="Sheet1"):
+    return write_workbook(path, sheet_name, timecard_rows(employees, days, paycodes, seed, noise))
+
+
+def write_payroll_workbook(path, employees, lines=3, seed=0, sheet_name="3_payrolls"):
+    return write_workbook(path, sheet_name, payroll_rows(employees, lines, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate timecard and payroll workbooks in the layouts of the real exports.")
+    parser.add_argument("kind", choices=("timecards", "payroll"), help="Report to generate")
+    parser.add_argument("output", help="Path of the .xlsx file to write")
+    parser.add_argument("--employees", type=int, default=1000, help="Number of employee blocks")
+    parser.add_argument("--days", type=int, default=10, help="Worked days per timecard (two punches each)")
+    parser.add_argument("--paycodes", type=int, default=3, help="Maximum summary paycodes per timecard")
+    parser.add_argument("--lines", type=int, default=3, help="Maximum earning lines per payroll employee")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed, the same seed gives the same workbook")
+    parser.add_argument("--no-noise", action="store_true",
+                        help="Leave out notes, bad punches and malformed timecard blocks")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    if args.kind == "timecards":
+        rows = write_timecards_workbook(args.output, args.employees, args.days, args.paycodes, args.seed,
+                                        noise=not args.no_noise)
+    else:
+        rows = write_payroll_workbook(args.output, args.employees, args.lines, args.seed)
+    print(f"Wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import pandas as pd
+import csv, gzip, pickle, tempfile
+
+BULK_FORMATS = ("csv", "csv.gz", "parquet")
+OUTPUT_MODES = ("per-file", "bulk", "wide")
+# Hours and money are numbers (a value that isn't becomes null, like a missing rate), anything
+# else is kept as text so a mixed column can't break the schema
+NUMERIC_FIELDS = {"totalHs", "hours", "workedHours", "dailyTotals", "gross", "rate", "amount", "total"}
+
+
+def is_numeric_field(field):
+    """Slots of a wide table are numeric like their field, summary[0].hours like hours."""
+    return field.rsplit('.', 1)[-1] in NUMERIC_FIELDS
+
+
+class _CsvSink:
+    def __init__(self, path, fields, compressed=False):
+        if compressed:
+            self.file = gzip.open(path, 'wt', newline='')
+        else:
+            self.file = open(path, 'w', newline='', buffering=1 << 20)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(fields)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetSink:
+    def __init__(self, path, fields):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("The parquet bulk output format requires pyarrow (pip install pyarrow)")
+        self.pa = pa
+        self.fields = fields
+        self.writer = None
+        self.path = path
+        self.pq = pq
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        arrays = []
+        for field, values in zip(self.fields, columns):
+            series = pd.Series(values, dtype=object)
+            if is_numeric_field(field):
+                arrays.append(self.pa.array(pd.to_numeric(series, errors='coerce'), type=self.pa.float64()))
+            else:
+                arrays.append(self.pa.array(series.where(series.isna(), series.astype(str)), type=self.pa.string(),
+                                            from_pandas=True))
+        table = self.pa.Table.from_arrays(arrays, names=self.fields)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is None:
+            # Nothing was written, still leave a valid empty file behind
+            schema = self.pa.schema([(field, self.pa.float64() if is_numeric_field(field) else self.pa.string())
+                                     for field in self.fields])
+            self.writer = self.pq.ParquetWriter(self.path, schema)
+        self.writer.close()
+
+
+def open_sink(path, fields, file_format="csv"):
+    """Open a bulk file with the given columns. Rows are then added with write(rows) and the file closed with close()."""
+    if file_format not in BULK_FORMATS:
+        raise ValueError(f"Unknown bulk output format '{file_format}', expected one of {BULK_FORMATS}")
+    if file_format == "parquet":
+        return _ParquetSink(path, fields)
+    return _CsvSink(path, fields, compressed=file_format == "csv.gz")
+
+
+def merge_fieldnames(merged, fields):
+    """Add the fields missing from `merged` (in place), each one right after the field before it in `fields`.
+
+    Merging the columns of summary[0..1] and summary[0..2] rows gives summary[0..2], so the
+    slots of every row stay in order in the union.
+    """
+    position = 0
+    for field in fields:
+        if field in merged:
+            position = merged.index(field) + 1
+        else:
+            merged.insert(position, field)
+            position += 1
+    return merged
+
+
+class WideTable:
+    """One fixed-schema table out of rows whose columns differ, such as the per-file CSV rows.
+
+    Written in two passes: rows are spooled to a temporary file while the union of their
+    columns is worked out, then the file is written once with the final columns, leaving
+    the slots a row doesn't have empty. Only the distinct column lists are kept in memory.
+    """
+
+    def __init__(self, path, file_format="csv", batch_rows=50000):
+        if file_format not in BULK_FORMATS:
+            raise ValueError(f"Unknown bulk output format '{file_format}', expected one of {BULK_FORMATS}")
+        self.path = path
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.fields = []
+        self._schemas = {}
+        self._spool = tempfile.TemporaryFile()
+
+    def write(self, fieldnames, values):
+        schema = self._schemas.get(tuple(fieldnames))
+        if schema is None:
+            schema = self._schemas[tuple(fieldnames)] = len(self._schemas)
+            merge_fieldnames(self.fields, fieldnames)
+        pickle.dump((schema, values), self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def close(self):
+        """Write the table with the union of the columns. Returns its path."""
+        column = {field: i for i, field in enumerate(self.fields)}
+        positions = [[column[field] for field in fieldnames] for fieldnames in self._schemas]
+        sink = open_sink(self.path, self.fields, self.file_format)
+        try:
+            self._spool.seek(0)
+            batch = []
+            while True:
+                try:
+                    schema, values = pickle.load(self._spool)
+                except EOFError:
+                    break
+                row = [""] * len(self.fields)
+                for i, value in zip(positions[schema], values):
+                    row[i] = value
+                batch.append(row)
+                if len(batch) >= self.batch_rows:
+                    sink.write(batch)
+                    batch = []
+            if batch:
+                sink.write(batch)
+        finally:
+            sink.close()
+            self._spool.close()
+        return self.path
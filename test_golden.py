@@ -0,0 +1,22 @@
+import pytest
+from benchmark import GOLDEN_DIR, GOLDEN_EMPLOYEES, check_golden
+from sheet_reader import available_readers
+
+
+def options(tmp_path, **overrides):
+    return {"streaming": False, "workers": 1, "output_mode": "per-file", "bulk_format": "csv", "vectorized": True,
+            "use_cache": False, "trace_memory": False, "work_dir": str(tmp_path), "reader": "auto", **overrides}
+
+
+@pytest.mark.parametrize("reader", available_readers())
+def test_golden(tmp_path, reader):
+    assert check_golden(GOLDEN_DIR, options(tmp_path, reader=reader), GOLDEN_EMPLOYEES, seed=0)
+
+
+def test_golden_streaming_per_block(tmp_path):
+    assert check_golden(GOLDEN_DIR, options(tmp_path, streaming=True, vectorized=False), GOLDEN_EMPLOYEES, seed=0)
+
+
+def test_golden_needs_per_file_output(tmp_path):
+    with pytest.raises(ValueError):
+        check_golden(GOLDEN_DIR, options(tmp_path, output_mode="bulk"), GOLDEN_EMPLOYEES, seed=0)
@@ -0,0 +1,79 @@
+import os, tempfile
+import pytest
+from journal import BlockJournal
+from synthetic_workbooks import timecard_rows, write_workbook
+from timecards_extractor import TIMECARD_START_MARKER, ExcelTableExtractor, TimecardCsvWriter, extract_timecards
+
+
+def timecard_blocks(employees):
+    """The rows of a synthetic timecards sheet, split into its title row and one list of rows per block."""
+    rows = list(timecard_rows(employees, seed=1))
+    starts = [i for i, row in enumerate(rows) if row[0] == TIMECARD_START_MARKER] + [len(rows)]
+    return rows[:starts[0]], [rows[start:end] for start, end in zip(starts, starts[1:])]
+
+
+def run(tmp_path, title, blocks, workbook="timecards.xlsx", output="out"):
+    """Extract the blocks with a journal in tmp_path. Returns (resumed blocks, the header and details CSVs)."""
+    path = os.path.join(tmp_path, workbook)
+    write_workbook(path, "Sheet1", title + [row for block in blocks for row in block])
+    output_path = os.path.join(tmp_path, output)
+    for folder in ("headers", "details"):
+        os.makedirs(os.path.join(output_path, folder), exist_ok=True)
+    extractor = ExcelTableExtractor(path, "Sheet1", use_cache=False)
+    with BlockJournal(os.path.join(tmp_path, "journal.jsonl")) as journal, TimecardCsvWriter(output_path) as writer:
+        extract_timecards(extractor, writer, journal=journal)
+    return journal.resumed, csv_contents(output_path)
+
+
+def csv_contents(output_path):
+    """Contents of the header and details CSVs, without their names (which hold the block's position)."""
+    contents = {}
+    for folder in ("headers", "details"):
+        files = sorted(os.listdir(os.path.join(output_path, folder)))
+        contents[folder] = sorted(open(os.path.join(output_path, folder, name)).read() for name in files)
+    return contents
+
+
+def fresh(tmp_path, title, blocks):
+    """The CSVs of a run without any journal entries."""
+    return run(tempfile.mkdtemp(dir=tmp_path), title, blocks)[1]
+
+
+@pytest.fixture
+def sheet(tmp_path):
+    title, blocks = timecard_blocks(8)
+    assert run(tmp_path, title, blocks) == (0, fresh(tmp_path, title, blocks))
+    return title, blocks
+
+
+def test_resume_unchanged(tmp_path, sheet):
+    title, blocks = sheet
+    assert run(tmp_path, title, blocks) == (len(blocks), fresh(tmp_path, title, blocks))
+
+
+def test_resume_with_block_removed(tmp_path, sheet):
+    title, blocks = sheet
+    blocks = blocks[:3] + blocks[4:]
+    assert run(tmp_path, title, blocks) == (len(blocks), fresh(tmp_path, title, blocks))
+
+
+def test_resume_with_block_inserted(tmp_path, sheet):
+    title, blocks = sheet
+    blocks = blocks[:2] + [timecard_blocks(12)[1][10]] + blocks[2:]
+    assert run(tmp_path, title, blocks) == (len(blocks) - 1, fresh(tmp_path, title, blocks))
+
+
+def test_resume_with_block_corrected(tmp_path, sheet):
+    title, blocks = sheet
+    corrected = [list(row) for row in blocks[5]]
+    corrected[1][11] = "File Number: 999"
+    blocks = blocks[:5] + [corrected] + blocks[6:]
+    assert run(tmp_path, title, blocks) == (len(blocks) - 1, fresh(tmp_path, title, blocks))
+
+
+def test_journal_shared_by_workbooks(tmp_path, sheet):
+    title, blocks = sheet
+    # Another workbook with the same blocks doesn't resume from this one, nor remove its files
+    assert run(tmp_path, title, blocks[:2], workbook="other.xlsx", output="other") == \
+        (0, fresh(tmp_path, title, blocks[:2]))
+    assert run(tmp_path, title, blocks) == (len(blocks), fresh(tmp_path, title, blocks))
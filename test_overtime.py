@@ -0,0 +1,59 @@
+from datetime import date, datetime
+import pandas as pd
+import pytest
+from overtime import calculate_overtime, summarize_by_employee
+
+MONDAY = date(2023, 10, 2)
+
+
+def details(hours, first_day=MONDAY, employee="1001"):
+    """Details rows with one punch per day of `hours`, starting on first_day."""
+    days = pd.date_range(first_day, periods=len(hours)).date.tolist()
+    return pd.DataFrame({"DATE": days, "HOURS": hours, "employee": employee})
+
+
+def totals(daily):
+    return summarize_by_employee(daily).iloc[0][["REG", "OT", "DT"]].tolist()
+
+
+@pytest.mark.parametrize("hours, expected", [
+    (7.5, [7.5, 0, 0]),
+    (10, [8, 2, 0]),
+    (14, [8, 4, 2]),
+])
+def test_daily_rules(hours, expected):
+    assert totals(calculate_overtime(details([hours]))) == expected
+
+
+def test_seven_ten_hour_days():
+    daily = calculate_overtime(details([10] * 7))
+    # Saturday's REG hours are past 40 for the week, Sunday is the 7th consecutive day
+    assert daily["REG"].tolist() == [8, 8, 8, 8, 8, 0, 0]
+    assert daily["OT"].tolist() == [2, 2, 2, 2, 2, 10, 8]
+    assert daily["DT"].tolist() == [0, 0, 0, 0, 0, 0, 2]
+    assert daily["seventhDay"].tolist() == [False] * 6 + [True]
+
+
+def test_weekly_overtime_ignores_daily_overtime():
+    assert totals(calculate_overtime(details([10, 10, 10, 10, 10, 4]))) == [40, 14, 0]
+
+
+@pytest.mark.parametrize("week_start, expected", [
+    (0, [40, 16, 0]),
+    # Workweeks from Wednesday split the days into Mon-Tue and Wed-Sun, with no 7th day or weekly OT
+    (2, [56, 0, 0]),
+])
+def test_week_start(week_start, expected):
+    daily = calculate_overtime(details([8] * 7), week_start=week_start)
+    assert totals(daily) == expected
+    assert daily["seventhDay"].any() == (week_start == 0)
+
+
+def test_employees_and_notes():
+    rows = pd.concat([details([14]), details([10] * 7, employee="1002"),
+                      pd.DataFrame({"DATE": [datetime(2023, 10, 2, 18), "Total", None, "10/2/2023"],
+                                    "HOURS": [2, 16, 3, 5], "employee": "1001"})], ignore_index=True)
+    daily = calculate_overtime(rows)
+    # The second punch adds to Monday, rows without a date are notes
+    assert daily["hours"].tolist() == [16] + [10] * 7
+    assert summarize_by_employee(daily)[["REG", "OT", "DT"]].values.tolist() == [[8, 4, 4], [40, 28, 2]]
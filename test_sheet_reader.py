@@ -0,0 +1,37 @@
+import csv, os
+from datetime import datetime
+import pytest
+from sheet_reader import convert_text
+from synthetic_workbooks import timecard_rows, write_workbook
+from timecards_extractor import iter_timecards
+
+
+@pytest.mark.parametrize("text, value", [
+    ("2023-10-02 00:00:00", datetime(2023, 10, 2)),
+    ("10/2/2023", datetime(2023, 10, 2)),
+    ("10/02/2023 08:05", datetime(2023, 10, 2, 8, 5)),
+    ("10/2/2023 8:05:30 PM", datetime(2023, 10, 2, 20, 5, 30)),
+    ("10/2/2023 12:30 AM", datetime(2023, 10, 2, 0, 30)),
+    ("13/2/2023", "13/2/2023"),
+    ("Date Range: 10/02/2023 - 10/15/2023", "Date Range: 10/02/2023 - 10/15/2023"),
+])
+def test_convert_text_dates(text, value):
+    assert convert_text(text) == value
+
+
+def test_spreadsheet_csv_export(tmp_path):
+    """A CSV export with m/d/yyyy dates gives the same timecards as the workbook."""
+    rows = list(timecard_rows(3, seed=2))
+    workbook = os.path.join(tmp_path, "timecards.xlsx")
+    write_workbook(workbook, "Sheet1", rows)
+    export = os.path.join(tmp_path, "timecards.csv")
+    with open(export, 'w', newline='') as f:
+        csv.writer(f).writerows([f"{value.month}/{value.day}/{value.year}" if isinstance(value, datetime) else value
+                                 for value in row] for row in rows)
+
+    def details(path):
+        return [list(timecard.details.rows()) for timecard in iter_timecards(path)]
+
+    expected = details(workbook)
+    assert all(expected)
+    assert details(export) == expected
@@ -1,16 +1,107 @@
+import numpy as np
 import pandas as pd
-import argparse, sys, os, csv
-from datetime import datetime
+import argparse, sys, os, csv, bisect, re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
+from sheet_reader import READERS, iter_sheet_rows, rows_to_frame
+from sheet_cache import read_excel_cached, clear_cache
+from instrumentation import instrument, instrumented_run, add_instrumentation_arguments
+from journal import BlockJournal
+from records import DETAILS_FIELDS, Timecard, TimecardHeader, TimecardDetails, NumberColumn
+from table_output import BULK_FORMATS, OUTPUT_MODES, WideTable, open_sink
+
+
+TABLE_KEYWORDS = ("Pay Code", "Timecard Details", "Date In", "Total")
+TOTALS_PREFIX = "Total"
+# Sheet columns the summary and details tables are taken from
+SUMMARY_COLUMNS = [0, 13]
+DETAILS_COLUMNS = [0, 1, 5, 11, 15, 16, 21, 31]
+# Summary paycodes and their EQUIV code
+PAYCODE_MAPPINGS = {
+    '6th Consecutive Day Overtime': '6OT',
+    'Overtime': 'OT',
+    'Paid Time Off': 'PTO',
+    'PAID UNION LUNCH': 'PUL',
+    'Regular': 'REG',
+    'Paid Meal Award': 'PMA',
+    'Sick': 'SCK',
+    'Vacation': 'VAC',
+    'Graveyard Shift $0.85': 'GS85',
+    'Doubletime': 'DT',
+    'Graveyard Shift $0.40': 'GS40'
+}
+# One dtype for every block, so the EQUIV of many summaries concatenate as a categorical
+EQUIV_DTYPE = pd.CategoricalDtype(list(PAYCODE_MAPPINGS.values()))
+# The token after each label, and up to three tokens for the date range. Lookaheads so a short
+# date range can't swallow a label that follows it on the same row.
+ADDITIONAL_INFO_PATTERN = re.compile(r'(?=Company Code:\s*(?P<company>\S+)'
+                                     r'|Date Range:\s*(?P<date_range>\S+(?:\s+\S+){0,2})'
+                                     r'|File Number:\s*(?P<file_number>\S+))')
+
+
+class KeywordIndex:
+    """Sorted row labels of the cells matching each table keyword, built once per sheet."""
+
+    def __init__(self, df, keywords=TABLE_KEYWORDS, prefixes=(TOTALS_PREFIX,)):
+        exact = {keyword: [] for keyword in keywords}
+        starts_with = {prefix: np.zeros(len(df), dtype=bool) for prefix in prefixes}
+        for col in df.columns:
+            column = df[col]
+            if column.dtype != object and not pd.api.types.is_string_dtype(column):
+                continue
+            matches = column[column.isin(keywords)]
+            for label, value in matches.items():
+                exact[value].append(label)
+            for prefix, mask in starts_with.items():
+                try:
+                    mask |= column.str.startswith(prefix, na=False).to_numpy(dtype=bool)
+                except AttributeError:
+                    # Object column without any string values
+                    continue
+
+        self.exact = {keyword: np.sort(np.asarray(labels)) for keyword, labels in exact.items()}
+        self.starts_with = {prefix: df.index[mask].to_numpy() for prefix, mask in starts_with.items()}
+
+    @staticmethod
+    def _in_range(labels, start, end):
+        return labels[bisect.bisect_left(labels, start):bisect.bisect_right(labels, end)].tolist()
+
+    def find(self, keyword, start, end):
+        """Row labels between start and end (inclusive) with a cell equal to the keyword."""
+        return self._in_range(self.exact[keyword], start, end)
+
+    def find_starting_with(self, prefix, start, end):
+        """Row labels between start and end (inclusive) with a string cell starting with the prefix."""
+        return self._in_range(self.starts_with[prefix], start, end)
 
 
 class ExcelTableExtractor:
-    def __init__(self, file_path, sheet_name):
+    def __init__(self, file_path, sheet_name, streaming=False, use_cache=False, df=None, reader="auto"):
         self.file_path = file_path
         self.sheet_name = sheet_name if sheet_name else "Sheet1"
-        self.df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+        self.streaming = streaming
+        self.reader = reader
+        # In streaming mode the sheet is never loaded as a whole, see iter_blocks()
+        if df is not None or streaming:
+            self.df = df
+        else:
+            with instrument.stage("load"):
+                self.df = read_excel_cached(file_path, sheet_name, use_cache=use_cache, reader=reader)
+            instrument.count("sheet_rows", len(self.df))
+        self._keyword_index = None
+
+    @property
+    def keyword_index(self):
+        """Keyword positions of the whole sheet, built on first use."""
+        if self._keyword_index is None:
+            self._keyword_index = KeywordIndex(self.df)
+        return self._keyword_index
 
     def clean_dataframe(self):
         self.df = self.df.dropna(axis=1, how='all')
+        self._keyword_index = None
 
     def find_keyword_positions(self, df, keyword):
         positions = []
@@ -18,14 +109,20 @@ class ExcelTableExtractor:
             positions.extend(df[df[col] == keyword].index.tolist())
         return positions
 
-    def extract_tables(self, df=None):
+    def extract_tables(self, df=None, keyword_index=None):
         if df is None:
             df = self.df
         keywords_first_table = ("Pay Code", "Timecard Details")
         keywords_second_table = ("Date In", "Total")
 
-        positions_first_table = [self.find_keyword_positions(df, key) for key in keywords_first_table]
-        positions_second_table = [self.find_keyword_positions(df, key) for key in keywords_second_table]
+        if keyword_index is not None and len(df):
+            # Bisect the sheet-wide index over this block's rows instead of re-masking every column
+            first, last = df.index[0], df.index[-1]
+            positions_first_table = [keyword_index.find(key, first, last) for key in keywords_first_table]
+            positions_second_table = [keyword_index.find(key, first, last) for key in keywords_second_table]
+        else:
+            positions_first_table = [self.find_keyword_positions(df, key) for key in keywords_first_table]
+            positions_second_table = [self.find_keyword_positions(df, key) for key in keywords_second_table]
 
         #print(f"Positions of first table keywords: {positions_first_table}")
         #print(f"Positions of second table keywords: {positions_second_table}")
@@ -44,39 +141,24 @@ class ExcelTableExtractor:
         table_details = df.loc[start_pos_second:end_pos_second + 1].dropna(how='all')
 
         # Clean the tables by removing columns with only NaN, NULL, or NaT values
-        table_summary = table_summary.iloc[:, [0, 13]]
+        table_summary = table_summary.iloc[:, SUMMARY_COLUMNS]
         table_summary.columns = ['PAYCODE', 'HOURS']
         table_summary = table_summary.iloc[1:-2]
 
-        # Define the equivalence mappings
-        paycode_mappings = {
-            '6th Consecutive Day Overtime': '6OT',
-            'Overtime': 'OT',
-            'Paid Time Off': 'PTO',
-            'PAID UNION LUNCH': 'PUL',
-            'Regular': 'REG',
-            'Paid Meal Award': 'PMA',
-            'Sick': 'SCK',
-            'Vacation': 'VAC',
-            'Graveyard Shift $0.85': 'GS85',
-            'Doubletime': 'DT',
-            'Graveyard Shift $0.40': 'GS40'
-        }
-
         '''
         # uncomment to check unique missing paycodes
         # Iterate through PAYCODE column and print values not in mappings
         unmapped_paycodes = set()
         for paycode in table_summary['PAYCODE']:
-            if paycode not in paycode_mappings:
+            if paycode not in PAYCODE_MAPPINGS:
                 unmapped_paycodes.add(paycode)
 
         print("Unmapped Paycodes:", unmapped_paycodes)
         '''
-        # Add the equivalence column
-        table_summary['EQUIV'] = table_summary['PAYCODE'].map(paycode_mappings)
+        # Add the equivalence column, unmapped paycodes are NaN
+        table_summary['EQUIV'] = pd.Categorical(table_summary['PAYCODE'].map(PAYCODE_MAPPINGS), dtype=EQUIV_DTYPE)
 
-        table_details = table_details.iloc[:, [0, 1, 5, 11, 15, 16, 21, 31]]
+        table_details = table_details.iloc[:, DETAILS_COLUMNS]
         table_details.columns = ['DAY', 'DATE', 'TIMESTAMP', 'HOURS', 'DAY_TOTALS', 'PAY_CODE', 'OUT_TYPE',
                                  'WORKED_DEP']
         table_details = table_details.iloc[1:-1]
@@ -88,151 +170,538 @@ class ExcelTableExtractor:
         string_columns = df.select_dtypes(include=[object, 'string'])
         return df[string_columns.apply(lambda x: x.str.startswith(keyword, na=False)).any(axis=1)]
 
+    @instrument.timed("additional_info")
     def extract_additional_info(self, df):
         """Extract additional information like Company Code, Date Range, and File Number."""
         additional_info = {}
 
-        # Iterate through the DataFrame rows and extract information
-        for _, row in df.iterrows():
-            row_string = ' '.join(row.dropna().astype(str))
-            if 'Company Code:' in row_string:
-                additional_info['Company Code'] = row_string.split('Company Code:')[1].split()[0]
-            if 'Date Range:' in row_string:
-                additional_info['Date Range'] = ' '.join(row_string.split('Date Range:')[1].split()[:3])
-            if 'File Number:' in row_string:
-                additional_info['File Number'] = int(float(row_string.split('File Number:')[1].split()[0]))
+        # The fields sit in the first rows of the block, so stop as soon as all three are found
+        for row in df.to_numpy(dtype=object):
+            row_string = ' '.join(str(value) for value in row[~pd.isna(row)])
+            for match in ADDITIONAL_INFO_PATTERN.finditer(row_string):
+                if match['company'] is not None and 'Company Code' not in additional_info:
+                    additional_info['Company Code'] = match['company']
+                elif match['date_range'] is not None and 'Date Range' not in additional_info:
+                    additional_info['Date Range'] = ' '.join(match['date_range'].split())
+                elif match['file_number'] is not None and 'File Number' not in additional_info:
+                    additional_info['File Number'] = int(float(match['file_number']))
+            if len(additional_info) == 3:
+                break
 
         return additional_info
 
-    def process_timecard_block(self, start, end):
-        timecard_df = self.df.loc[start:end + 1]
-        try:
-            table_summary, table_details = self.extract_tables(timecard_df)
-            table_totals = self.find_rows_starting_with_total(timecard_df, "Total")  # Find totals for this block
+    def iter_blocks(self):
+        """Yield (start, end, timecard_df) for every timecard block of the sheet."""
+        if self.streaming:
+            # Reading the rows and finding the blocks happen together when streaming
+            yield from instrument.timed_iter("load", stream_timecard_blocks(self.file_path, self.sheet_name,
+                                                                            self.reader))
+            return
+        with instrument.stage("block_detection"):
+            blocks = find_timecard_blocks(self.df)
+        for start, end in blocks:
+            yield start, end, self.df.loc[start:end + 1]
+
+    def timecard_jobs(self):
+        """Jobs of process_timecard_job for every block of the sheet, read as they are consumed."""
+        for index, (start, end, timecard_df) in enumerate(self.iter_blocks()):
+            yield self.file_path, self.sheet_name, index, start, end, timecard_df
+
+    def iter_timecards(self, workers=1, errors="skip"):
+        """Lazily yield a Timecard for every block of the sheet, in sheet order.
+
+        Blocks are only read and parsed as the Timecards are consumed, so stopping early stops
+        the extraction, and nothing is written to disk. Blocks that can't be parsed are skipped,
+        or raise a ValueError with errors="raise". With workers > 1 a few blocks are parsed ahead
+        in a process pool.
+        """
+        if errors not in ("skip", "raise"):
+            raise ValueError(f"errors must be 'skip' or 'raise', not '{errors}'")
+        for index, start, end, error, timecard in run_timecard_jobs(self.timecard_jobs(), workers, self):
+            if error is None:
+                yield timecard
+            elif errors == "raise":
+                raise ValueError(f"Timecard block {index} (rows {start} to {end}): {error}")
+            else:
+                instrument.skip("extraction", error, block=index, start=start, end=end)
+
+    def __iter__(self):
+        return self.iter_timecards()
+
+    def extract_block(self, timecard_df):
+        """Extract the tables and header info of one block, raising if the block is malformed."""
+        # Streamed blocks and blocks shipped to a worker are not part of self.df, so they get an index of their own
+        with instrument.stage("table_extraction"):
+            keyword_index = KeywordIndex(timecard_df) if self.df is None else self.keyword_index
+            table_summary, table_details = self.extract_tables(timecard_df, keyword_index)
+            # Find totals for this block
+            if len(timecard_df):
+                totals_rows = keyword_index.find_starting_with(TOTALS_PREFIX, timecard_df.index[0],
+                                                               timecard_df.index[-1])
+                table_totals = timecard_df.loc[totals_rows]
+            else:
+                table_totals = self.find_rows_starting_with_total(timecard_df, TOTALS_PREFIX)
             table_totals = table_totals.dropna(axis=1, how='all')
             table_totals.columns = ['', 'HOURS_1', 'HOURS_2']
             table_totals['HOURS'] = table_totals['HOURS_1'].combine_first(table_totals['HOURS_2'])
             table_totals.drop(['HOURS_2', 'HOURS_1'], axis=1, inplace=True)
 
-            additional_info = self.extract_additional_info(timecard_df)
-            return table_summary, table_details, table_totals, additional_info
+        additional_info = self.extract_additional_info(timecard_df)
+        return table_summary, table_details, table_totals, additional_info
+
+    def process_timecard_block(self, start, end):
+        timecard_df = self.df.loc[start:end + 1]
+        try:
+            return self.extract_block(timecard_df)
         except ValueError as e:
             #print(f"Error processing block: {e}")
+            instrument.skip("table_extraction", f"{type(e).__name__}: {e}", start=start)
             return None, None, None, None  # or handle the error as needed
 
 
-def generate_timecard_csv(additional_info, table_summary, table_details, output_path, block_index):
-    """Generate a Timecard header CSV """
+@lru_cache(maxsize=256)
+def parse_date_range(date_range):
+    """("YYYY-MM-DD", "YYYY-MM-DD") of a "MM/DD/YYYY - MM/DD/YYYY" range.
+
+    Cached, as every timecard of an export usually has the same pay period.
+    """
+    # Extract and format dates
+    date_range = date_range.split(' - ')
+    date_from = datetime.strptime(date_range[0], '%m/%d/%Y').strftime('%Y-%m-%d') if len(date_range) > 0 else ''
+    date_to = datetime.strptime(date_range[1], '%m/%d/%Y').strftime('%Y-%m-%d') if len(date_range) > 1 else ''
+    return date_from, date_to
+
+
+def build_timecard_header_record(additional_info, table_summary):
+    """Build the Timecard header row."""
     # Prepare data for CSV
     companyCode = additional_info.get('Company Code', '')
     fileNumber = f"000000{additional_info.get('File Number', '')}"[-6:]
     employeeId = f"{companyCode}{fileNumber}"
 
-    # Extract and format dates
-    date_range = additional_info.get('Date Range', '').split(' - ')
-    date_from = datetime.strptime(date_range[0], '%m/%d/%Y').strftime('%Y-%m-%d') if len(date_range) > 0 else ''
-    date_to = datetime.strptime(date_range[1], '%m/%d/%Y').strftime('%Y-%m-%d') if len(date_range) > 1 else ''
+    date_from, date_to = parse_date_range(additional_info.get('Date Range', ''))
 
     # Create a unique label for each timecard block
     timecard_label = f"{employeeId} - {date_from.replace('-', '/')} - {date_to.replace('-', '/')}"
-    timecard_label_filename = f"{employeeId}_{date_from.replace('-', '')}_{date_to.replace('-', '')}_{block_index}"
-    try:
-        #print(f"Generating timecard with Label {timecard_label}")
-        csv_data = {
-            "company.companyCode": companyCode,
-            "employee": employeeId,
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "supervisor": "",  # Assuming supervisor's name is fixed
-            "totalHs": table_summary['HOURS'].sum(),
-            "timecardLabel": timecard_label
-        }
-
-        # Add summary data
-        for i in range(len(table_summary)):
-            row = table_summary.iloc[i]
-            csv_data[f"summary[{i}].paycode"] = row['EQUIV']
-            csv_data[f"summary[{i}].hours"] = row['HOURS']
-
-        output_file = f"{output_path}/headers/Timecard_Header_{timecard_label_filename.replace('/', '-')}.csv"
-        # Write to CSV
-        with open(output_file, 'w', newline='') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=csv_data.keys())
-            writer.writeheader()
-            writer.writerow(csv_data)
 
-        # Generate timecard details CSV
-        generate_timecard_details_csv(timecard_label, table_details, output_path, block_index)
+    return TimecardHeader(
+        company_code=companyCode,
+        employee=employeeId,
+        date_from=date_from,
+        date_to=date_to,
+        supervisor="",  # Assuming supervisor's name is fixed
+        total_hours=table_summary['HOURS'].sum(),
+        label=timecard_label,
+        summary=tuple(zip(table_summary['EQUIV'].tolist(), table_summary['HOURS'].tolist())),
+    )
 
+
+def generate_timecard_csv(additional_info, table_summary, table_details, output_path, block_index):
+    """Generate a Timecard header CSV """
+    header = build_timecard_header_record(additional_info, table_summary)
+    try:
+        with TimecardCsvWriter(output_path) as writer:
+            writer.write(header, build_timecard_details(header.label, table_details), block_index)
     except Exception as e:
-        print(f"Error generating CSV for Timecard {timecard_label}: {e}")
+        print(f"Error generating CSV for Timecard {header.label}: {e}")
 
 
-def generate_timecard_details_csv(timecard_label, table_details, output_path, block_index):
-    # Prepare data for CSV
-    csv_rows = []
-    notes = ""  # Initialize notes as an empty string
+def _punch_time(timestamp, part):
+    return datetime.strptime(timestamp.split(' - ')[part], '%I:%M %p').time()
 
-    for _, row in table_details.iterrows():
+
+@instrument.timed("timestamp_parsing")
+def build_timecard_details(timecard_label, table_details):
+    """Turn the details table into the TimecardDetails of the details CSV.
+
+    Rows whose TIMESTAMP or DATE can't be parsed are skipped, and the first cell of the last
+    one skipped is kept as the notes of the next row that gets written. Timecards have a few
+    dozen rows, where a plain loop beats column-wise pandas calls and their fixed cost.
+    """
+    columns = {key: [] for key in ("in", "out", "hours", "totals", "pay_code", "out_type", "dep", "notes")}
+    notes = ""
+    for row in table_details.itertuples(index=False):
+        day = row.DATE
         try:
-            # Format DATE and TIMESTAMP into datetime strings
-            datetime_in = datetime.combine(row['DATE'], datetime.strptime(row['TIMESTAMP'].split(' - ')[0],
-                                                                          '%I:%M %p').time()).strftime('%Y-%m-%d %H:%M')
-            datetime_out = datetime.combine(row['DATE'], datetime.strptime(row['TIMESTAMP'].split(' - ')[1],
-                                                                           '%I:%M %p').time()).strftime(
-                '%Y-%m-%d %H:%M')
-        except Exception as e:
-            # Handle the case where TIMESTAMP is not in the expected format
-            #print(f"Skipping row due to formatting error: {e}. Adding information as comment in the next row")
-            notes = str(row.iloc[0])  # Save the first element of the row as a note if there's an error
-            continue  # Skip this row
-
-        # Handle nan values for dailyTotals and payCode
-        daily_totals = row['DAY_TOTALS'] if pd.notna(row['DAY_TOTALS']) else 0
-        pay_code = row['PAY_CODE'] if pd.notna(row['PAY_CODE']) else ''
-        out_type = row['OUT_TYPE'] if pd.notna(row['OUT_TYPE']) else ''
-
-        csv_row = {
-            "timecard": timecard_label,
-            "datetimeIn": datetime_in,
-            "datetimeOut": datetime_out,
-            "workedHours": row['HOURS'],
-            "dailyTotals": daily_totals,
-            "payCode": pay_code,
-            "outType": out_type,
-            "workedDepID": row['WORKED_DEP'],
-            "notes": notes
-        }
-        notes = ""  # Clean notes
-
-        csv_rows.append(csv_row)
+            if not isinstance(day, date) or pd.isna(day):
+                raise TypeError("not a date")
+            day = datetime(day.year, day.month, day.day)
+            datetime_in = datetime.combine(day, _punch_time(row.TIMESTAMP, 0))
+            datetime_out = datetime.combine(day, _punch_time(row.TIMESTAMP, 1))
+        except Exception:
+            notes = str(row[0])
+            continue
+        columns["in"].append(datetime_in)
+        columns["out"].append(datetime_out)
+        columns["hours"].append(row.HOURS)
+        columns["totals"].append(row.DAY_TOTALS if pd.notna(row.DAY_TOTALS) else 0)
+        columns["pay_code"].append(row.PAY_CODE if pd.notna(row.PAY_CODE) else '')
+        columns["out_type"].append(row.OUT_TYPE if pd.notna(row.OUT_TYPE) else '')
+        columns["dep"].append(row.WORKED_DEP)
+        columns["notes"].append(notes)
+        notes = ""
+
+    return TimecardDetails(
+        label=timecard_label,
+        datetime_in=columns["in"],
+        datetime_out=columns["out"],
+        worked_hours=NumberColumn.from_objects(columns["hours"]),
+        daily_totals=NumberColumn.from_objects(columns["totals"]),
+        pay_code=columns["pay_code"],
+        out_type=columns["out_type"],
+        worked_dep=columns["dep"],
+        notes=columns["notes"],
+    )
 
+
+def generate_timecard_details_csv(timecard_label, table_details, output_path, block_index):
+    details = build_timecard_details(timecard_label, table_details)
     output_file = f"{output_path}/details/Timecard_Details_{timecard_label.replace('/', '').replace(' - ', '_')}_{block_index}.csv"
+    _write_details_file(output_file, details)
+
+
+def _write_details_file(output_file, details):
     # Write to CSV
     with open(output_file, 'w', newline='') as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=csv_rows[0].keys())
-        writer.writeheader()
-        writer.writerows(csv_rows)
+        if details.empty:
+            raise ValueError("no timecard details rows to write")
+        writer = csv.writer(csvfile)
+        writer.writerow(DETAILS_FIELDS)
+        writer.writerows(details.rows())
+
+
+class TimecardCsvWriter:
+    """Writes a header and a details CSV per timecard under headers/ and details/ of the output path."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def paths(self, header, block_index):
+        """Paths of the timecard's header and details CSVs."""
+        dates = f"{header.date_from.replace('-', '')}_{header.date_to.replace('-', '')}"
+        timecard_label_filename = f"{header.employee}_{dates}_{block_index}"
+        output_file = f"{self.output_path}/headers/Timecard_Header_{timecard_label_filename.replace('/', '-')}.csv"
+        label = header.label
+        details_file = f"{self.output_path}/details/Timecard_Details_{label.replace('/', '').replace(' - ', '_')}_{block_index}.csv"
+        return [output_file, details_file]
+
+    def write(self, header, details, block_index):
+        """Write the timecard's two CSVs and return their paths."""
+        output_file, details_file = self.paths(header, block_index)
+        with open(output_file, 'w', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header.fieldnames())
+            writer.writerow(header.values())
+
+        _write_details_file(details_file, details)
+        return [output_file, details_file]
+
+    def close(self):
+        pass
+
+
+BULK_HEADER_FIELDS = ["timecardLabel", "company.companyCode", "employee", "dateFrom", "dateTo", "supervisor",
+                      "totalHs", "paycode", "hours"]
+
+
+class BulkTimecardWriter:
+    """Appends every timecard to one headers file and one details file under the output path.
+
+    Headers get a row per summary paycode, and both files are keyed by the timecard label.
+    With headers="wide" they get a row per timecard instead, laid out like the per-file
+    header CSVs with the summary[i] slots of the whole run as columns (Timecard_Headers_Wide).
+    Formats are "csv", "csv.gz" and "parquet" (needs pyarrow). Rows are buffered and written
+    in batches of `batch_rows`.
+    """
+
+    def __init__(self, output_path, file_format="csv", batch_rows=50000, headers="long"):
+        if file_format not in BULK_FORMATS:
+            raise ValueError(f"Unknown bulk output format '{file_format}', expected one of {BULK_FORMATS}")
+        self.file_format = file_format
+        self.batch_rows = batch_rows
+        self.wide_headers = None
+        if headers == "wide":
+            self.headers_file = f"{output_path}/Timecard_Headers_Wide.{file_format}"
+            self.wide_headers = WideTable(self.headers_file, file_format, batch_rows)
+        else:
+            self.headers_file = f"{output_path}/Timecard_Headers.{file_format}"
+        self.details_file = f"{output_path}/Timecard_Details.{file_format}"
+        self._sinks = {}
+        self._buffers = {self.headers_file: [], self.details_file: []}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, header, details, block_index):
+        """Buffer the timecard's rows and return the paths of the two bulk files."""
+        if self.wide_headers is not None:
+            self.wide_headers.write(header.fieldnames(), header.values())
+            return self._write_details(details)
+        fixed = [header.label, header.company_code, header.employee, header.date_from, header.date_to,
+                 header.supervisor, header.total_hours]
+        # A timecard without summary still gets its header row
+        for paycode, hours in header.summary or [("", "")]:
+            self._append(self.headers_file, BULK_HEADER_FIELDS, [fixed + [paycode, hours]])
+        return self._write_details(details)
+
+    def paths(self, header, block_index):
+        """No file is the timecard's own, the bulk files hold every timecard."""
+        return []
+
+    def _write_details(self, details):
+        if details.empty:
+            raise ValueError("no timecard details rows to write")
+        self._append(self.details_file, DETAILS_FIELDS, details.rows())
+        return [self.headers_file, self.details_file]
+
+    def _append(self, path, fields, rows):
+        buffer = self._buffers[path]
+        buffer.extend(rows)
+        if len(buffer) >= self.batch_rows:
+            self._flush(path, fields)
+
+    def _flush(self, path, fields):
+        buffer = self._buffers[path]
+        if path not in self._sinks:
+            self._sinks[path] = self._open(path, fields)
+        if buffer:
+            self._sinks[path].write(buffer)
+        buffer.clear()
+
+    def _open(self, path, fields):
+        return open_sink(path, fields, self.file_format)
+
+    def close(self):
+        with instrument.stage("csv_writing"):
+            if self.wide_headers is not None:
+                self.wide_headers.close()
+            else:
+                self._flush(self.headers_file, BULK_HEADER_FIELDS)
+            self._flush(self.details_file, DETAILS_FIELDS)
+            for sink in self._sinks.values():
+                sink.close()
+        self._sinks = {}
+
+
+def make_timecard_writer(output_path, output_mode="per-file", bulk_format="csv"):
+    """The writer of an output mode: per-file CSVs, bulk files, or bulk files with wide headers."""
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{output_mode}', expected one of {OUTPUT_MODES}")
+    if output_mode == "per-file":
+        return TimecardCsvWriter(output_path)
+    return BulkTimecardWriter(output_path, bulk_format, headers="wide" if output_mode == "wide" else "long")
+
+
+TIMECARD_START_MARKER = "Timecard Detail Report with Signature:"
+TIMECARD_END_MARKER = "Prepared On:"
+
+
+def find_rows_containing(df, text):
+    """Boolean array telling which rows have a string cell containing `text`."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        column = df[col]
+        if column.dtype != object and not pd.api.types.is_string_dtype(column):
+            continue
+        try:
+            mask |= column.str.contains(text, regex=False, na=False).to_numpy(dtype=bool)
+        except AttributeError:
+            # Object column without any string values
+            continue
+    return mask
 
 
 def find_timecard_blocks(df):
-    timecard_blocks = []
+    """(start, end) row labels of every timecard block, found with one scan of the sheet for the markers."""
+    has_start = find_rows_containing(df, TIMECARD_START_MARKER)
+    has_end = find_rows_containing(df, TIMECARD_END_MARKER)
+
+    blocks = []
     start = None
-    for i, row in df.iterrows():
-        row_str = row.to_string()
-        if "Timecard Detail Report with Signature:" in row_str:
-            start = i
+    # Only the marker rows need to be walked to pair starts with ends
+    for pos in np.flatnonzero(has_start | has_end):
+        if has_start[pos]:
+            start = pos
             # Check if the end marker is also in the same row
-            if "Prepared On:" in row_str:
+            if not has_end[pos]:
+                continue
+        elif start is None:
+            continue
+        blocks.append((df.index[start], df.index[pos]))
+        start = None  # Reset start for the next block
+
+    return blocks
+
+
+def _row_has(values, text):
+    return any(isinstance(value, str) and text in value for value in values)
+
+
+def stream_timecard_blocks(file_path, sheet_name, reader="auto"):
+    """Read the sheet row by row and yield (start, end, timecard_df) as soon as a block is complete.
+
+    Blocks hold the same rows as the eager path's df.loc[start:end + 1], so only one block
+    is kept in memory at a time. A block is at least as wide as the columns the tables are
+    taken from, so a block whose rows stop short gets empty cells there like the eager path.
+    """
+    rows, labels = [], []
+    start = end = None
+    width = max(SUMMARY_COLUMNS + DETAILS_COLUMNS) + 1
+    for i, values in enumerate(iter_sheet_rows(file_path, sheet_name, reader)):
+        width = max(width, len(values))
+        if end is not None:
+            # The row after the end marker belongs to the block as well
+            if i == end + 1:
+                rows.append(values)
+                labels.append(i)
+            # but an empty one is only kept once data follows, as read_excel drops trailing empty rows
+            if not values:
+                continue
+            yield start, end, rows_to_frame(rows, labels, width)
+            rows, labels = [], []
+            start = end = None
+
+        if _row_has(values, TIMECARD_START_MARKER):
+            start = i
+            rows, labels = [], []
+        if start is not None:
+            rows.append(values)
+            labels.append(i)
+            if _row_has(values, TIMECARD_END_MARKER):
                 end = i
-                timecard_blocks.append((start, end))
-                start = None  # Reset start for the next block
-        elif start is not None and "Prepared On:" in row_str:
-            end = i
-            timecard_blocks.append((start, end))
-            start = None  # Reset start for the next block
 
-    return timecard_blocks
+    if end is not None:
+        keep = labels.index(end) + 1
+        yield start, end, rows_to_frame(rows[:keep], labels[:keep], width)
+
+
+def process_timecard_job(job, extractor=None):
+    """Extract one timecard block and build its header and details rows. Runs in the worker
+    processes when --workers > 1, else with the sheet's own extractor and keyword index.
+
+    Returns (index, start, end, error, timecard) where timecard is the parsed Timecard, or
+    None with the error when the block could not be processed.
+    """
+    file_path, sheet_name, index, start, end, timecard_df = job
+    instrument.count("blocks")
+    instrument.count("block_rows", len(timecard_df))
+    if extractor is None:
+        # Only the block's rows are shipped to the worker, never the whole sheet
+        extractor = ExcelTableExtractor(file_path, sheet_name, streaming=True)
+    try:
+        table_summary, table_details, table_totals, additional_info = extractor.extract_block(timecard_df)
+        header = build_timecard_header_record(additional_info, table_summary)
+        details = build_timecard_details(header.label, table_details)
+    except Exception as e:
+        return index, start, end, f"{type(e).__name__}: {e}", None
+    instrument.count("details_rows", len(details))
+    totals = tuple(zip(table_totals.iloc[:, 0].tolist(), table_totals['HOURS'].tolist()))
+    return index, start, end, None, Timecard(index, start, end, header, details, totals, additional_info)
+
+
+def _process_timecard_job_instrumented(job, trace_memory):
+    """process_timecard_job in a worker, sending back what the worker's instrumentation recorded."""
+    if not instrument.enabled:
+        instrument.enable(trace_memory)
+    # A forked worker starts with a copy of the parent's records, only this job's are sent back
+    instrument.reset()
+    result = process_timecard_job(job)
+    return result, instrument.snapshot()
+
+
+def run_timecard_jobs(jobs, workers, extractor=None):
+    """Run the jobs, in a pool of `workers` processes if more than one, and yield their results in order.
+
+    In-process jobs are run by `extractor`, the one that made them, so its sheet's keyword index is reused.
+
+    At most a couple of jobs per worker are in flight, so streamed blocks are not all queued in memory.
+    """
+    if workers <= 1:
+        for job in jobs:
+            yield process_timecard_job(job, extractor)
+        return
+
+    def result(future):
+        if not instrument.enabled:
+            return future.result()
+        result, snapshot = future.result()
+        instrument.merge(snapshot)
+        return result
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for job in jobs:
+            if instrument.enabled:
+                pending.append(executor.submit(_process_timecard_job_instrumented, job, instrument.trace_memory))
+            else:
+                pending.append(executor.submit(process_timecard_job, job))
+            if len(pending) >= workers * 2:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+
+
+def extract_timecards(extractor, writer, workers=1, journal=None):
+    """Extract every timecard block of the extractor's sheet and write it. Returns (blocks, skipped).
+
+    With a BlockJournal, blocks it already holds with the same content and files are not
+    processed again, every processed block is recorded in it, and the files of the blocks
+    no longer in the sheet are deleted.
+    """
+    jobs = extractor.timecard_jobs()
+    if journal is not None:
+        jobs = journal.pending(jobs)
+
+    blocks = skipped = 0
+    for index, start, end, error, timecard in run_timecard_jobs(jobs, workers, extractor):
+        blocks += 1
+        if error is not None:
+            print(f"Skipping block {index} (rows {start} to {end}): {error}")
+            instrument.skip("extraction", error, block=index, start=start, end=end)
+            if journal is not None:
+                journal.record(index, start, end, "skipped", error=error)
+            skipped += 1
+            continue
+        header, details = timecard.header, timecard.details
+        try:
+            with instrument.stage("csv_writing"):
+                files = writer.write(header, details, index)
+            if journal is not None:
+                journal.record(index, start, end, "written", files)
+        except Exception as e:
+            print(f"Error generating CSV for Timecard {header.label}: {e}")
+            instrument.skip("csv_writing", f"{type(e).__name__}: {e}", block=index, start=start, end=end,
+                            timecard=header.label)
+            if journal is not None:
+                # Retried on the next --resume, see journal.DONE_STATUSES. The files it left behind
+                # (the header of a timecard without details) are still recorded so they can be cleaned up
+                files = [path for path in writer.paths(header, index) if os.path.exists(path)]
+                journal.record(index, start, end, "failed", files, error=f"{type(e).__name__}: {e}")
+    if journal is not None:
+        journal.prune(extractor.file_path, extractor.sheet_name)
+    instrument.count("skipped_blocks", skipped)
+    return blocks, skipped
+
+
+def iter_timecards(file_path, sheet_name="Sheet1", streaming=True, workers=1, errors="skip", use_cache=False,
+                   reader="auto"):
+    """Lazily yield the parsed Timecard of every block of a sheet, without writing any file.
+
+    The sheet is streamed row by row by default, so memory stays bounded by one block (plus
+    the blocks in flight with workers > 1). To write the CSVs as well, pass each Timecard's
+    header, details and index to a TimecardCsvWriter or BulkTimecardWriter.
+    """
+    extractor = ExcelTableExtractor(file_path, sheet_name, streaming=streaming, use_cache=use_cache, reader=reader)
+    yield from extractor.iter_timecards(workers, errors)
 
 
 def main():
@@ -240,40 +709,45 @@ def main():
         parser = argparse.ArgumentParser(description="Extract tables from an Excel file.")
         parser.add_argument("file_path", help="Path to the Excel file")
         parser.add_argument("sheet_name", nargs='?', default="Sheet1", help="Name of the sheet to extract tables from")
+        parser.add_argument("--streaming", action="store_true",
+                            help="Read the sheet row by row, keeping only one timecard block in memory")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Number of processes used to extract the timecard blocks")
+        parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="per-file",
+                            help="Write one header and one details CSV per timecard, or a single file of each; "
+                                 "wide writes the headers with the summary columns of the whole run")
+        parser.add_argument("--bulk-format", choices=BULK_FORMATS, default="csv",
+                            help="File format of the bulk output mode")
+        parser.add_argument("--reader", choices=READERS, default="auto",
+                            help="Backend reading the sheet, calamine when installed (openpyxl when streaming)")
+        parser.add_argument("--no-cache", action="store_true", help="Parse the workbook without the sheet cache")
+        parser.add_argument("--clear-cache", action="store_true", help="Empty the sheet cache before running")
+        parser.add_argument("--resume", action="store_true",
+                            help="Keep a journal of the written blocks and skip the ones already written and unchanged")
+        parser.add_argument("--journal", default="./generated_csv/Timecard_Journal.jsonl",
+                            help="Journal file used with --resume, shared by every workbook and sheet")
+        add_instrumentation_arguments(parser)
         args = parser.parse_args()
 
+        if args.clear_cache:
+            clear_cache()
+
         if not os.path.exists(args.file_path):
             raise FileNotFoundError(f"The file '{args.file_path}' does not exist.")
-
-        extractor = ExcelTableExtractor(args.file_path, args.sheet_name)
-        #print(f"Extracting tables...\n{extractor.df.head()}")
-        timecard_blocks = find_timecard_blocks(extractor.df)
-        #print(f"Found {len(timecard_blocks)} timecard blocks")
-        #print(timecard_blocks)
-
-        for index, (start, end) in enumerate(timecard_blocks):
-            #print(f"\n\nProcessing block from {start} to {end}")
-            table_summary, table_details, table_totals, additional_info = extractor.process_timecard_block(start, end)
-            if table_summary is None:
-                #print(f"Skipping block from {start} to {end} due to errors")
-                continue
-
-            # Extract additional information
-            # additional_info = extractor.extract_additional_info()
-            #print("----- Timecard Information: -----")
-            #print(additional_info)
-
-            # Print the tables and total rows
-            #print("\n----- Summary -----")
-            #print(table_summary)
-            #print("\n----- Details -----")
-            #print(table_details)
-            #print("\nTotals")
-            #print(table_totals)
-
-            # Generate CSV
-            path = './generated_csv'
-            generate_timecard_csv(additional_info, table_summary, table_details, path, index)
+        if args.resume and args.output_mode != "per-file":
+            raise ValueError("--resume needs the per-file output mode, the bulk files are rewritten on every run")
+
+        with instrumented_run(args.report, args.profile, args.report_memory):
+            extractor = ExcelTableExtractor(args.file_path, args.sheet_name, streaming=args.streaming,
+                                            use_cache=not args.no_cache, reader=args.reader)
+
+            writer = make_timecard_writer('./generated_csv', args.output_mode, args.bulk_format)
+            journal = BlockJournal(args.journal) if args.resume else None
+            with writer:
+                extract_timecards(extractor, writer, args.workers, journal)
+            if journal is not None:
+                journal.close()
+                print(f"Skipped {journal.resumed} unchanged blocks found in {args.journal}")
 
     except FileNotFoundError as e:
         print(f"File Error: {e}")